@@ -1,3 +1,9 @@
+from functools import lru_cache
+
+import numpy as np
+
+from monitoring import metrics
+
 WEIGHTS = {
     "motorcycle": 1,
     "car": 2,
@@ -6,6 +12,7 @@ WEIGHTS = {
     "person": 0.5   # pedestrians influence
 }
 
+@metrics.timed("congestion")
 def calculate_congestion(detections):
     """
     Input: list of detections in QUEUE zone
@@ -15,3 +22,30 @@ def calculate_congestion(detections):
     for d in detections:
         score += WEIGHTS.get(d["class"], 1)
     return score
+
+@lru_cache(maxsize=8)
+def weight_table(names):
+    """
+    WEIGHTS as a lookup array indexed by class id (names: tuple of class names)
+    """
+    return np.array([WEIGHTS.get(name, 1) for name in names], dtype=np.float32)
+
+@metrics.timed("congestion")
+def calculate_congestion_batch(batch):
+    """
+    Vectorized calculate_congestion() for a DetectionBatch
+    """
+    if len(batch) == 0:
+        return 0
+    score = float(weight_table(batch.names)[batch.class_ids].sum())
+    # Same type as calculate_congestion(): int unless a 0.5 weight is involved
+    return int(score) if score.is_integer() else score
+
+@metrics.timed("congestion")
+def calculate_zone_congestion(batch, labels, num_zones):
+    """
+    Congestion score per zone in one pass: labels[i] is the zone of
+    detection i (e.g. from ZoneMap.classify)
+    """
+    weights = weight_table(batch.names)[batch.class_ids]
+    return np.bincount(labels, weights=weights, minlength=num_zones)
@@ -1,3 +1,10 @@
+from functools import lru_cache
+
+import numpy as np
+
+from monitoring import metrics
+
+@metrics.timed("emergency")
 def detect_emergency(detections):
     """
     Simple logic:
@@ -8,3 +15,22 @@ def detect_emergency(detections):
         if d["class"] == "ambulance":
             return True
     return False
+
+
+EMERGENCY_CLASSES = ("ambulance",)
+
+@lru_cache(maxsize=8)
+def emergency_table(names):
+    """
+    Boolean lookup array indexed by class id
+    """
+    return np.array([name in EMERGENCY_CLASSES for name in names], dtype=bool)
+
+@metrics.timed("emergency")
+def detect_emergency_batch(batch):
+    """
+    Vectorized detect_emergency() for a DetectionBatch
+    """
+    if len(batch) == 0:
+        return False
+    return bool(emergency_table(batch.names)[batch.class_ids].any())
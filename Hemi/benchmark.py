@@ -0,0 +1,372 @@
+"""
+End-to-end pipeline benchmark.
+
+    python benchmark.py --frames 1000 --output bench.json
+    python benchmark.py --background "../All Basic code/images" --detector yolo
+
+Renders a synthetic traffic video (moving vehicles over a plain road or
+over the sample road images), then runs it through every stage of the
+pipeline with a per-stage timer. The default stub detector replays the
+rendered vehicle boxes, so runs are deterministic and need no weights.
+Results (fps, per-stage latency percentiles, peak RSS) are written as
+JSON so runs can be compared between commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from vision.detector import (
+    infer, extract_batch, extract_detections, TARGET_WIDTH, TARGET_HEIGHT
+)
+from vision.zone_mapper import classify_zone, classify_zones, load_zone_map, QUEUE
+from analytics.congestion import (
+    calculate_congestion, calculate_congestion_batch, calculate_zone_congestion
+)
+from analytics.emergency import detect_emergency, detect_emergency_batch
+from signal_control.optimizer import decide_signal
+from dashboard.data_store import (
+    add_congestion, add_emergency, enable_telemetry, close_telemetry
+)
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+STAGES = ("decode", "resize", "inference", "postprocess", "zones",
+          "congestion", "emergency", "decision", "store")
+
+# Source video: larger than 480p so the resize stage does real work
+SOURCE_WIDTH = 1280
+SOURCE_HEIGHT = 720
+SOURCE_FPS = 25
+
+# Class table of the stub detector (contiguous ids like a YOLO model);
+# bicycle is outside VALID_CLASSES and exercises the class filter
+STUB_NAMES = {0: "person", 1: "car", 2: "motorcycle", 3: "bus", 4: "truck",
+              5: "bicycle", 6: "ambulance"}
+# Class mix and box size (w, h as a fraction of the source frame)
+VEHICLE_TYPES = (
+    ("car", 0.55, (0.07, 0.10)),
+    ("motorcycle", 0.2, (0.03, 0.06)),
+    ("bus", 0.07, (0.10, 0.18)),
+    ("truck", 0.08, (0.09, 0.15)),
+    ("person", 0.05, (0.02, 0.05)),
+    ("bicycle", 0.04, (0.03, 0.05)),
+    ("ambulance", 0.01, (0.08, 0.12)),
+)
+
+# =========================
+# SYNTHETIC SOURCE
+# =========================
+class SyntheticScene:
+    """
+    Vehicles driving down LANES lanes at random speeds. frame_boxes(i)
+    is deterministic for a given seed, so the stub detector can replay
+    exactly what was rendered.
+    """
+
+    def __init__(self, frames, vehicles=40, lanes=4, seed=0,
+                 width=SOURCE_WIDTH, height=SOURCE_HEIGHT):
+        rng = np.random.default_rng(seed)
+        names = [t[0] for t in VEHICLE_TYPES]
+        probs = np.array([t[1] for t in VEHICLE_TYPES])
+        sizes = {t[0]: t[2] for t in VEHICLE_TYPES}
+        ids = {name: i for i, name in STUB_NAMES.items()}
+
+        self.width = width
+        self.height = height
+        kinds = rng.choice(len(names), size=vehicles, p=probs / probs.sum())
+        self.class_ids = np.array([ids[names[k]] for k in kinds], dtype=np.int64)
+        self.size = np.array([sizes[names[k]] for k in kinds]) * (width, height)
+
+        lane_width = width / lanes
+        lane = rng.integers(0, lanes, vehicles)
+        self.x = (lane + 0.5) * lane_width + rng.uniform(-0.2, 0.2, vehicles) * lane_width
+        # Pixels per frame; vehicles wrap around to the top
+        self.speed = rng.uniform(0.002, 0.01, vehicles) * height
+        self.start = rng.uniform(0, height, vehicles)
+        self.confidence = rng.uniform(0.3, 0.95, vehicles).astype(np.float32)
+        self.frames = frames
+
+    def frame_boxes(self, i, scale=(1.0, 1.0)):
+        """
+        (class_ids, xyxy boxes, confidences) of frame i, boxes scaled by
+        (sx, sy) from source coordinates
+        """
+        span = self.height + self.size[:, 1]
+        y = (self.start + self.speed * i) % span - self.size[:, 1] / 2
+        half = self.size / 2
+        boxes = np.stack([self.x - half[:, 0], y - half[:, 1],
+                          self.x + half[:, 0], y + half[:, 1]], axis=1)
+        boxes = np.clip(boxes, 0, (self.width, self.height, self.width, self.height))
+        boxes *= (scale[0], scale[1], scale[0], scale[1])
+
+        visible = (boxes[:, 3] - boxes[:, 1]) > 2
+        return self.class_ids[visible], boxes[visible].astype(np.float32), self.confidence[visible]
+
+def load_backgrounds(image_dir, width=SOURCE_WIDTH, height=SOURCE_HEIGHT):
+    if image_dir is None:
+        road = np.full((height, width, 3), 90, dtype=np.uint8)
+        return [road]
+
+    images = []
+    for name in sorted(os.listdir(image_dir)):
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is not None:
+            images.append(cv2.resize(image, (width, height)))
+    if not images:
+        raise ValueError(f"no readable images in {image_dir}")
+    return images
+
+def render_video(path, scene, backgrounds, fps=SOURCE_FPS):
+    """
+    Write the scene to a video file, switching background image every
+    few seconds
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps,
+                             (scene.width, scene.height))
+    colors = np.random.default_rng(1).integers(40, 255, (len(STUB_NAMES), 3))
+
+    for i in range(scene.frames):
+        frame = backgrounds[(i // (fps * 4)) % len(backgrounds)].copy()
+        class_ids, boxes, _ = scene.frame_boxes(i)
+        for cls_id, (x1, y1, x2, y2) in zip(class_ids, boxes.astype(int)):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), colors[cls_id].tolist(), -1)
+        writer.write(frame)
+
+    writer.release()
+
+# =========================
+# STUB DETECTOR
+# =========================
+class StubTensor:
+    """
+    Just enough of torch.Tensor for the detection extractors
+    """
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def __getitem__(self, i):
+        return self.array[i]
+
+class StubBoxes:
+    def __init__(self, cls, xyxy, conf):
+        self.cls = StubTensor(cls)
+        self.xyxy = StubTensor(xyxy)
+        self.conf = StubTensor(conf)
+
+    def __len__(self):
+        return len(self.cls.array)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield StubBoxes(self.cls.array[i:i + 1], self.xyxy.array[i:i + 1],
+                            self.conf.array[i:i + 1])
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.names = STUB_NAMES
+
+class StubDetector:
+    """
+    Replays the scene's boxes (scaled to 480p) for consecutive frames
+    instead of running a model
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.index = 0
+        self.scale = (TARGET_WIDTH / scene.width, TARGET_HEIGHT / scene.height)
+
+    def __call__(self, frames):
+        results = []
+        for _ in frames:
+            cls, boxes, conf = self.scene.frame_boxes(self.index, self.scale)
+            results.append(StubResult(StubBoxes(cls.astype(np.float32), boxes, conf)))
+            self.index += 1
+        return results
+
+# =========================
+# BENCHMARK
+# =========================
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize(samples):
+    ms = np.array(samples) * 1000
+    return {
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "total_s": round(float(ms.sum()) / 1000, 4),
+    }
+
+def run_benchmark(video_path, detector, columnar=True, zone_map=None, warmup=10):
+    """
+    Run every frame of the video through the pipeline stages one at a
+    time, timing each stage. Returns (frames, wall seconds, stage timings).
+    """
+    timings = {stage: [] for stage in STAGES}
+    extract = extract_batch if columnar else extract_detections
+    clock = time.perf_counter
+
+    cap = cv2.VideoCapture(video_path)
+    frames = 0
+    wall_start = clock()
+
+    while True:
+        t0 = clock()
+        ret, raw = cap.read()
+        if not ret:
+            break
+        t1 = clock()
+        frame = cv2.resize(raw, (TARGET_WIDTH, TARGET_HEIGHT))
+        t2 = clock()
+        result = detector([frame])[0]
+        t3 = clock()
+        detections = extract(result, frame.shape[0])
+        t4 = clock()
+
+        # Zone classification, then the queue-zone congestion score
+        if columnar:
+            if zone_map is not None:
+                labels = zone_map.classify(detections.centers())
+            else:
+                labels = classify_zones(detections.centers()[:, 1], detections.frame_height)
+            t5 = clock()
+            if zone_map is not None:
+                per_zone = calculate_zone_congestion(detections, labels, len(zone_map.names))
+                congestion = float(per_zone[zone_map.queue_labels].sum())
+            else:
+                congestion = calculate_congestion_batch(detections.select(labels == QUEUE))
+            t6 = clock()
+            emergency = detect_emergency_batch(detections)
+        else:
+            if zone_map is not None:
+                labels = zone_map.classify([d["center"] for d in detections])
+                queue = [d for d, q in zip(detections, zone_map.in_queue(labels)) if q]
+            else:
+                queue = [d for d in detections
+                         if classify_zone(d["center"][1], d["frame_height"]) == "QUEUE"]
+            t5 = clock()
+            congestion = calculate_congestion(queue)
+            t6 = clock()
+            emergency = detect_emergency(detections)
+        t7 = clock()
+
+        decide_signal(congestion, emergency)
+        t8 = clock()
+        add_congestion(congestion)
+        if emergency:
+            add_emergency()
+        t9 = clock()
+
+        frames += 1
+        if frames == warmup:
+            # Restart the clock once caches and lazy imports are warm
+            wall_start = clock()
+            timings = {stage: [] for stage in STAGES}
+            continue
+
+        for stage, start, end in zip(STAGES, (t0, t1, t2, t3, t4, t5, t6, t7, t8),
+                                     (t1, t2, t3, t4, t5, t6, t7, t8, t9)):
+            timings[stage].append(end - start)
+
+    cap.release()
+    return max(frames - warmup, 0), clock() - wall_start, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Hemi pipeline end to end")
+    parser.add_argument("--frames", type=int, default=1000, help="length of the synthetic video")
+    parser.add_argument("--vehicles", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--background", help="image folder used as road backgrounds")
+    parser.add_argument("--video", help="benchmark an existing video instead (needs --detector yolo)")
+    parser.add_argument("--detector", choices=("stub", "yolo"), default="stub")
+    parser.add_argument("--dicts", action="store_true", help="dict detections instead of columnar")
+    parser.add_argument("--camera", help="use this camera's polygon zones from zones.json")
+    parser.add_argument("--telemetry", action="store_true", help="also write to a SQLite telemetry store")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    if args.video and args.detector == "stub":
+        parser.error("the stub detector only works with the synthetic video")
+
+    zone_map = load_zone_map(args.camera) if args.camera else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = args.video
+        scene = None
+        if video_path is None:
+            scene = SyntheticScene(args.frames, args.vehicles, seed=args.seed)
+            video_path = os.path.join(tmp, "synthetic.mp4")
+            render_video(video_path, scene, load_backgrounds(args.background))
+
+        detector = StubDetector(scene) if args.detector == "stub" else infer
+
+        if args.telemetry:
+            enable_telemetry(os.path.join(tmp, "telemetry.db"))
+        try:
+            frames, wall, timings = run_benchmark(video_path, detector, not args.dicts, zone_map)
+        finally:
+            close_telemetry()
+
+    if frames == 0:
+        raise SystemExit("no frames were benchmarked (video too short or unreadable)")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": {
+            "frames": frames,
+            "source": args.video or ("images" if args.background else "synthetic"),
+            "detector": args.detector,
+            "columnar": not args.dicts,
+            "camera": args.camera,
+            "telemetry": args.telemetry,
+            "vehicles": args.vehicles,
+            "seed": args.seed,
+        },
+        "fps": round(frames / wall, 1),
+        "stages": {stage: summarize(timings[stage]) for stage in STAGES},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
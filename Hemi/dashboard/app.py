@@ -1,34 +1,186 @@
-from flask import Flask, render_template, jsonify
-from dashboard.data_store import get_data
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask, Response, render_template, jsonify, request
+from dashboard.data_store import (
+    get_summary, get_average, attach_telemetry, sync_telemetry, version
+)
+from dashboard.events import EventHub
+from dashboard.telemetry import TELEMETRY_DB
+from monitoring import metrics
 
 app = Flask(__name__)
 
+# Read what the pipeline process writes (see main.py TELEMETRY)
+attach_telemetry(TELEMETRY_DB)
+
+# Dashboard-side metrics; the pipeline's come from its snapshot file
+metrics.enable()
+SSE_CLIENTS = metrics.gauge("hemi_sse_clients", "Connected live-update clients")
+PIPELINE_SNAPSHOT_AGE = metrics.gauge(
+    "hemi_pipeline_metrics_age_seconds", "Age of the pipeline metrics snapshot")
+
+# Live updates: one pump thread pulls new telemetry and fans it out
+PUSH_INTERVAL = 0.5
+hub = EventHub()
+_pump_started = False
+_pump_lock = threading.Lock()
+
+# Distinguishes ETags across dashboard restarts (versions restart at 0)
+_BOOT_ID = f"{int(time.time()):x}"
+
+# Pre-serialized /api/traffic-data bodies for the current store version,
+# keyed by (points, last); least recently used beyond SNAPSHOT_CACHE_SIZE
+# are dropped, since (points, last) come from the client
+SNAPSHOT_CACHE_SIZE = 8
+_snapshots = OrderedDict()
+_snapshot_version = None
+_snapshot_lock = threading.Lock()
+
+# Default and maximum number of points returned for the trend chart
+HISTORY_POINTS = 300
+MAX_HISTORY_POINTS = 2000
+
+def congestion_level(avg):
+    if avg < 10:
+        return "LOW"
+    elif avg < 20:
+        return "MEDIUM"
+    return "HIGH"
+
+def _pump():
+    """
+    Single consumer of new telemetry rows: they update the local store
+    and are pushed to subscribers as deltas
+    """
+    level = None
+    while True:
+        samples, events = sync_telemetry()
+
+        if samples:
+            hub.publish("congestion", [[ts, value] for ts, value in samples])
+
+            new_level = congestion_level(get_average())
+            if new_level != level:
+                level = new_level
+                hub.publish("level", level)
+
+        for ts, kind, payload in events:
+            hub.publish(kind, {"ts": ts, "data": payload})
+
+        time.sleep(PUSH_INTERVAL)
+
+def start_pump():
+    global _pump_started
+    with _pump_lock:
+        if not _pump_started:
+            threading.Thread(target=_pump, name="telemetry-pump", daemon=True).start()
+            _pump_started = True
+
+@app.before_request
+def _ensure_pump():
+    start_pump()
+
 @app.route("/")
 def dashboard():
     return render_template("index.html")
 
 @app.route("/api/traffic-data")
 def traffic_data():
-    congestion, emergency_count = get_data()
+    """
+    ?points=N  downsample the whole buffer to N bucket means (default)
+    ?last=N    return the newest N raw samples instead
+    """
+    points = min(request.args.get("points", HISTORY_POINTS, type=int), MAX_HISTORY_POINTS)
+    last = request.args.get("last", type=int)
+    if last is not None:
+        last = min(last, MAX_HISTORY_POINTS)
+
+    body, etag = snapshot(max(1, points), last)
 
-    if len(congestion) == 0:
-        level = "LOW"
-        avg = 0
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        avg = sum(congestion) / len(congestion)
-        if avg < 10:
-            level = "LOW"
-        elif avg < 20:
-            level = "MEDIUM"
-        else:
-            level = "HIGH"
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def build_snapshot(points, last):
+    summary = get_summary(points, last)
+    avg = summary["average"]
 
-    return jsonify({
-        "congestion_history": congestion,
+    return json.dumps({
+        "congestion_history": summary["history"],
+        "samples": summary["samples"],
         "average_congestion": round(avg, 2),
-        "congestion_level": level,
-        "emergency_count": emergency_count
-    })
+        "window_averages": {k: round(v, 2) for k, v in summary["window_averages"].items()},
+        "congestion_level": congestion_level(avg),
+        "emergency_count": summary["emergency_count"]
+    }).encode()
+
+@metrics.timed("api_snapshot")
+def snapshot(points, last):
+    """
+    Serialized response body and ETag, rebuilt only when the store has
+    changed since the cached copy was made
+    """
+    global _snapshot_version
+    current = version()
+    key = (points, last)
+
+    with _snapshot_lock:
+        if _snapshot_version != current:
+            _snapshots.clear()
+            _snapshot_version = current
+
+        cached = _snapshots.get(key)
+        if cached is None:
+            etag = f"{_BOOT_ID}-{current}-{points}-{last}"
+            cached = (build_snapshot(points, last), etag)
+            _snapshots[key] = cached
+            if len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+                _snapshots.popitem(last=False)
+        else:
+            _snapshots.move_to_end(key)
+
+    return cached
+
+@app.route("/api/stream")
+def stream():
+    """
+    Server-Sent Events: congestion samples, level changes, emergencies
+    and signal decisions as they arrive
+    """
+    sub = hub.subscribe()
+    return Response(
+        hub.stream(sub),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/api/stream/stats")
+def stream_stats():
+    return jsonify(hub.stats())
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus text format: this process's metrics plus the latest
+    snapshot exported by the pipeline (see main.py METRICS)
+    """
+    SSE_CLIENTS.set(hub.stats()["subscribers"])
+
+    sources = []
+    written, pipeline = metrics.read_snapshot(metrics.METRICS_SNAPSHOT)
+    if written is not None:
+        PIPELINE_SNAPSHOT_AGE.set(round(time.time() - written, 3))
+        sources.append(({"process": "pipeline"}, pipeline))
+    sources.append(({"process": "dashboard"}, metrics.snapshot()))
+
+    return Response(metrics.render(sources), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
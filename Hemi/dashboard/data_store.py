@@ -1,12 +1,220 @@
-congestion_history = []
+import threading
+import time
+
+import numpy as np
+
+from dashboard.telemetry import TelemetryWriter, TelemetryReader, TELEMETRY_DB
+from monitoring import metrics
+
+# One hour of per-frame samples at 25 fps
+CAPACITY = 90000
+
+# Windowed averages (seconds)
+WINDOWS = {"1m": 60, "15m": 900, "1h": 3600}
+
+class RingBuffer:
+    """
+    Fixed-capacity sample buffer. The all-time sum/count and a sum/count
+    per time window are kept up to date on insert, so averages are O(1)
+    no matter how long the system has been up.
+    """
+
+    def __init__(self, capacity=CAPACITY, windows=WINDOWS):
+        self.capacity = capacity
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.next_seq = 0          # sequence number of the next sample
+
+        self.total_sum = 0.0
+        self.total_count = 0
+
+        self.windows = dict(windows)
+        # name -> [oldest sequence number inside the window, sum]
+        self.window_state = {name: [0, 0.0] for name in self.windows}
+
+    def __len__(self):
+        return min(self.next_seq, self.capacity)
+
+    def _oldest_seq(self):
+        return self.next_seq - len(self)
+
+    def _evict(self, now):
+        for name, span in self.windows.items():
+            state = self.window_state[name]
+            cutoff = now - span
+            while state[0] < self.next_seq and self.times[state[0] % self.capacity] < cutoff:
+                state[1] -= self.values[state[0] % self.capacity]
+                state[0] += 1
+
+    def append(self, value, t=None):
+        t = time.time() if t is None else t
+
+        if self.next_seq >= self.capacity:
+            # Overwriting the oldest sample: drop it from any window still holding it
+            oldest = self._oldest_seq()
+            for state in self.window_state.values():
+                if state[0] == oldest:
+                    state[1] -= self.values[oldest % self.capacity]
+                    state[0] += 1
+
+        i = self.next_seq % self.capacity
+        self.values[i] = value
+        self.times[i] = t
+        self.next_seq += 1
+
+        self.total_sum += value
+        self.total_count += 1
+        for state in self.window_state.values():
+            state[1] += value
+
+        self._evict(t)
+
+    def average(self):
+        if self.total_count == 0:
+            return 0
+        return self.total_sum / self.total_count
+
+    def window_average(self, name, now=None):
+        self._evict(time.time() if now is None else now)
+        start, total = self.window_state[name]
+        count = self.next_seq - start
+        if count == 0:
+            return 0
+        return total / count
+
+    def window_averages(self, now=None):
+        return {name: self.window_average(name, now) for name in self.windows}
+
+    def ordered(self, last=None):
+        """
+        Samples oldest -> newest as an array; last=N keeps only the newest N
+        """
+        n = len(self) if last is None else min(last, len(self))
+        start = (self.next_seq - n) % self.capacity
+        idx = (start + np.arange(n)) % self.capacity
+        return self.values[idx]
+
+    def downsample(self, points):
+        """
+        At most `points` bucket means covering the whole buffer
+        """
+        values = self.ordered()
+        if len(values) <= points:
+            return values
+        edges = np.linspace(0, len(values), points + 1).astype(np.int64)[:-1]
+        counts = np.diff(np.append(edges, len(values)))
+        return np.add.reduceat(values, edges) / counts
+
+congestion_history = RingBuffer()
 emergency_count = 0
+_lock = threading.Lock()
+
+# Bumped on every change so readers can cache snapshots between changes
+_version = 0
+
+# Cross-process sharing: the pipeline writes through a TelemetryWriter,
+# dashboard processes pull new rows through a TelemetryReader
+_writer = None
+_reader = None
+
+def enable_telemetry(path=TELEMETRY_DB):
+    """
+    Pipeline side: also batch every sample/event into the shared store
+    """
+    global _writer
+    _writer = TelemetryWriter(path)
+
+def close_telemetry():
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+def attach_telemetry(path=TELEMETRY_DB):
+    """
+    Dashboard side: read what the pipeline process writes
+    """
+    global _reader
+    _reader = TelemetryReader(path)
 
+@metrics.timed("store_sync")
+def sync_telemetry():
+    """
+    Pull rows written since the last sync into the local buffer.
+    Returns the new (samples, events).
+    """
+    global emergency_count, _version
+    if _reader is None:
+        return [], []
+
+    samples, events = _reader.fetch_new()
+    if not samples and not events:
+        return samples, events
+
+    with _lock:
+        _version += 1
+        for ts, value in samples:
+            congestion_history.append(value, ts)
+        for ts, kind, payload in events:
+            if kind == "emergency":
+                emergency_count += 1
+
+    return samples, events
+
+@metrics.timed("store")
 def add_congestion(value):
-    congestion_history.append(value)
+    global _version
+    t = time.time()
+    with _lock:
+        congestion_history.append(value, t)
+        _version += 1
+    if _writer is not None:
+        _writer.record_congestion(value, t)
 
+@metrics.timed("store")
 def add_emergency():
-    global emergency_count
-    emergency_count += 1
+    global emergency_count, _version
+    with _lock:
+        emergency_count += 1
+        _version += 1
+    if _writer is not None:
+        _writer.record_event("emergency")
+
+@metrics.timed("store")
+def add_signal(decision):
+    if _writer is not None:
+        _writer.record_event("signal", decision)
+
+def version():
+    return _version
 
 def get_data():
-    return congestion_history, emergency_count
+    with _lock:
+        return congestion_history.ordered().tolist(), emergency_count
+
+def get_average():
+    """
+    All-time average congestion, without building a history view
+    """
+    with _lock:
+        return congestion_history.average()
+
+def get_summary(points=300, last=None):
+    """
+    Everything the dashboard API needs without copying the whole history:
+    a downsampled view (or the newest `last` raw samples) plus the
+    running averages
+    """
+    with _lock:
+        if last is not None:
+            history = congestion_history.ordered(last)
+        else:
+            history = congestion_history.downsample(points)
+
+        return {
+            "history": [round(float(v), 2) for v in history],
+            "samples": congestion_history.total_count,
+            "average": congestion_history.average(),
+            "window_averages": congestion_history.window_averages(),
+            "emergency_count": emergency_count,
+        }
@@ -0,0 +1,93 @@
+import json
+import queue
+import threading
+
+from monitoring import metrics
+
+# Updates a subscriber may have waiting before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 64
+
+DROPPED_UPDATES = metrics.counter(
+    "hemi_sse_updates_dropped_total", "Live updates dropped for slow dashboard clients")
+
+def format_event(kind, data):
+    """
+    Server-Sent Events wire format, serialized once per update
+    """
+    return f"event: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+
+class Subscriber:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        # Set when updates were dropped; the client is told to resync
+        self.lagged = False
+
+class EventHub:
+    """
+    Fans one producer out to many SSE clients. Each update is serialized
+    once and the same bytes are offered to every subscriber; a client whose
+    queue is full misses the update instead of buffering without limit.
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self):
+        sub = Subscriber(self.queue_size)
+        with self.lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def publish(self, kind, data):
+        message = format_event(kind, data)
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                sub.dropped += 1
+                sub.lagged = True
+                if metrics.ENABLED:
+                    DROPPED_UPDATES.inc()
+
+        self.published += 1
+
+    def stream(self, sub, keepalive=15.0):
+        """
+        Generator of SSE bytes for one subscriber
+        """
+        try:
+            yield b"retry: 2000\n\n"
+            while True:
+                try:
+                    message = sub.queue.get(timeout=keepalive)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+                    continue
+
+                if sub.lagged:
+                    sub.lagged = False
+                    yield format_event("resync", {"dropped": sub.dropped})
+
+                yield message
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscribers),
+        }
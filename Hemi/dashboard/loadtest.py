@@ -0,0 +1,138 @@
+"""
+Concurrent load test for the dashboard read path.
+
+    python -m dashboard.loadtest --clients 200 --duration 10
+    python -m dashboard.loadtest --url http://127.0.0.1:5000 --etag
+
+Without --url an in-process server is started on a free local port and
+filled with synthetic samples first.
+"""
+import argparse
+import http.client
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ENDPOINTS = ["/api/traffic-data", "/api/traffic-data?last=100"]
+
+def client_loop(host, port, endpoints, use_etag, deadline, latencies, errors, status_counts):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    etags = {}
+    i = 0
+
+    while time.perf_counter() < deadline:
+        path = endpoints[i % len(endpoints)]
+        i += 1
+        headers = {}
+        if use_etag and path in etags:
+            headers["If-None-Match"] = etags[path]
+
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except Exception:
+            errors.append(path)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+
+        latencies[path].append(time.perf_counter() - start)
+        status_counts[response.status] = status_counts.get(response.status, 0) + 1
+        etag = response.getheader("ETag")
+        if etag:
+            etags[path] = etag
+
+    conn.close()
+
+def run(host, port, clients, duration, endpoints=ENDPOINTS, use_etag=False):
+    latencies = {path: [] for path in endpoints}
+    errors = []
+    status_counts = {}
+    deadline = time.perf_counter() + duration
+
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(host, port, endpoints, use_etag, deadline, latencies, errors, status_counts),
+            daemon=True,
+        )
+        for _ in range(clients)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"clients": clients, "duration": round(elapsed, 2), "errors": len(errors),
+              "status": status_counts, "endpoints": {}}
+    total = 0
+    for path, values in latencies.items():
+        total += len(values)
+        if not values:
+            continue
+        ms = np.array(values) * 1000
+        report["endpoints"][path] = {
+            "requests": len(values),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "rps": round(len(values) / elapsed, 1),
+        }
+    report["rps"] = round(total / elapsed, 1)
+    return report
+
+def start_local_server(samples):
+    from werkzeug.serving import make_server
+
+    import dashboard.data_store as data_store
+    from dashboard.app import app
+
+    rng = np.random.default_rng(0)
+    for value in rng.integers(0, 40, samples):
+        data_store.add_congestion(int(value))
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard read-path load test")
+    parser.add_argument("--url", help="dashboard base URL (default: in-process server)")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match")
+    parser.add_argument("--samples", type=int, default=90000,
+                        help="synthetic samples for the in-process server")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = start_local_server(args.samples)
+        host, port = "127.0.0.1", server.server_port
+
+    try:
+        report = run(host, port, args.clients, args.duration, use_etag=args.etag)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
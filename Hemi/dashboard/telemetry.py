@@ -0,0 +1,141 @@
+import collections
+import json
+import sqlite3
+import threading
+import time
+
+# Shared between the pipeline (single writer) and the dashboard (readers)
+TELEMETRY_DB = "telemetry.db"
+
+# The writer thread commits buffered rows this often (seconds)
+FLUSH_INTERVAL = 0.5
+
+# Rows older than this are pruned by the writer (seconds)
+RETENTION = 24 * 3600
+PRUNE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS congestion (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT
+);
+"""
+
+def _connect(path, readonly=False):
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: readers never block the writer and vice versa
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+    return conn
+
+class TelemetryWriter:
+    """
+    Hot-path calls only append to an in-memory deque; a background thread
+    batches the rows into SQLite every FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, path=TELEMETRY_DB, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.samples = collections.deque()
+        self.events = collections.deque()
+
+        self.conn = _connect(path)
+        self._last_prune = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def record_congestion(self, value, ts=None):
+        self.samples.append((time.time() if ts is None else ts, value))
+
+    def record_event(self, kind, payload=None, ts=None):
+        self.events.append((time.time() if ts is None else ts, kind, payload))
+
+    def flush(self):
+        samples = [self.samples.popleft() for _ in range(len(self.samples))]
+        events = [self.events.popleft() for _ in range(len(self.events))]
+        if not samples and not events:
+            return
+
+        with self.conn:
+            self.conn.executemany("INSERT INTO congestion (ts, value) VALUES (?, ?)", samples)
+            self.conn.executemany(
+                "INSERT INTO events (ts, kind, payload) VALUES (?, ?, ?)",
+                [(ts, kind, None if p is None else json.dumps(p)) for ts, kind, p in events],
+            )
+
+    def prune(self, retention=RETENTION):
+        cutoff = time.time() - retention
+        with self.conn:
+            self.conn.execute("DELETE FROM congestion WHERE ts < ?", (cutoff,))
+            self.conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                self.prune()
+                self._last_prune = time.monotonic()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+        self.conn.close()
+
+class TelemetryReader:
+    """
+    Read-only view used by dashboard processes. fetch_new() returns only
+    rows written since the previous call.
+    """
+
+    def __init__(self, path=TELEMETRY_DB):
+        self.path = path
+        self.conn = None
+        self.last_sample_id = 0
+        self.last_event_id = 0
+        self.lock = threading.Lock()
+
+    def _connection(self):
+        if self.conn is None:
+            self.conn = _connect(self.path, readonly=True)
+        return self.conn
+
+    def fetch_new(self, limit=100000):
+        with self.lock:
+            try:
+                conn = self._connection()
+                samples = conn.execute(
+                    "SELECT id, ts, value FROM congestion WHERE id > ? ORDER BY id LIMIT ?",
+                    (self.last_sample_id, limit),
+                ).fetchall()
+                events = conn.execute(
+                    "SELECT id, ts, kind, payload FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                    (self.last_event_id, limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # The pipeline hasn't created the database yet
+                self.conn = None
+                return [], []
+
+            if samples:
+                self.last_sample_id = samples[-1][0]
+            if events:
+                self.last_event_id = events[-1][0]
+
+        return (
+            [(ts, value) for _, ts, value in samples],
+            [(ts, kind, None if p is None else json.loads(p)) for _, ts, kind, p in events],
+        )
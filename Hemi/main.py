@@ -1,30 +1,164 @@
-from vision.detector import detect_vehicles
-from vision.zone_mapper import classify_zone
-from analytics.congestion import calculate_congestion
-from analytics.emergency import detect_emergency
-from signal_control.optimizer import decide_signal
-from simulation.simulator import simulate_signal
-from dashboard.data_store import add_congestion, add_emergency
+from vision.detector import stream_detections, video_fps, configure_model, WEIGHTS, DEVICE
+from vision.model_registry import startup_report
+from simulation.scheduler import SignalScheduler, RealClock, VirtualClock
+from dashboard.data_store import enable_telemetry, close_telemetry, add_signal
+from dashboard.telemetry import TELEMETRY_DB
+from pipeline.stages import analyze_frame
+from pipeline.staged import StagedPipeline
+from vision.autoscaler import LatencyAutoscaler
+from vision.keyframe import stream_keyframe_detections
+from vision.tracker import VehicleTracker
+from vision.zone_mapper import load_zone_map
+from monitoring import metrics
 
 VIDEO_PATH = "assets/traffic_video.mp4"
 
-if __name__ == "__main__":
-    all_frames = detect_vehicles(VIDEO_PATH)
+# Polygon zones for this camera come from zones.json; without an entry
+# the default ENTRY/QUEUE/EXIT height bands are used
+CAMERA_ID = "junction1_north"
+HEADLESS = False
+
+# Frames per YOLO call; raise for recorded footage to trade a little
+# latency (at most MAX_BATCH_WAIT seconds) for throughput
+BATCH_SIZE = 1
+MAX_BATCH_WAIT = 0.05
+
+# Columnar NumPy detections (DetectionBatch) with vectorized analytics
+COLUMNAR = True
+
+# e.g. ("QUEUE",): run YOLO only on the padded rows of those zones
+# (None = full frame). Detections outside them are then not produced.
+# With a zone map, names are its polygons and "QUEUE" its queue_zones.
+ROI_ZONES = None
+
+# Run decode, inference and analytics as separate stages connected by
+# bounded queues (always headless)
+PIPELINED = False
+REPORT_EVERY = 100
+
+# > 1 runs YOLO only every KEYFRAME_INTERVAL frames (or earlier when the
+# tracker loses boxes) and carries boxes forward in between (headless)
+KEYFRAME_INTERVAL = 1
+
+# Track vehicles across frames (needs COLUMNAR) so decisions can use the
+# queue arrival rate instead of raw box counts alone
+TRACKING = False
+
+# Recorded footage: signal phases follow video time (1/fps per frame),
+# so a recording replays as fast as it can be processed. Use False for
+# live cameras.
+VIRTUAL_CLOCK = True
+
+# Share congestion/emergency data with the dashboard process
+TELEMETRY = True
+
+# Per-stage latency histograms and frame counters, exported for the
+# dashboard's /metrics route
+METRICS = True
+
+# Dummy inferences before the first real frame
+WARMUP_RUNS = 2
+
+# PyTorch weights, or an artifact exported by vision.backends for CPU
+# nodes, e.g. "yolo26x_int8_openvino_model/" or "yolo26x_int8.onnx"
+MODEL_WEIGHTS = WEIGHTS
+
+# Per-frame inference budget (ms). When set, the model variant and input
+# size follow load (vision.autoscaler.LEVELS, starting from the most
+# accurate); None keeps MODEL_WEIGHTS fixed.
+LATENCY_BUDGET_MS = None
 
-    for frame in all_frames:
-        queue_zone_vehicles = []
+# Record detections here and replay them on later runs over the same
+# video with the same model settings, e.g. "detection_cache",
+# so zone/decision experiments skip inference (serial path, video files
+# only, needs KEYFRAME_INTERVAL = 1 and LATENCY_BUDGET_MS = None).
+# None = always run the model.
+DETECTION_CACHE = None
+
+def make_scheduler():
+    if VIRTUAL_CLOCK:
+        return SignalScheduler(VirtualClock(), on_green=add_signal)
+
+    scheduler = SignalScheduler(RealClock(), on_green=add_signal)
+    scheduler.start()
+    return scheduler
+
+def on_decision(scheduler, signal_decision, frame_time):
+    scheduler.submit(signal_decision)
+    if VIRTUAL_CLOCK:
+        scheduler.clock.advance(frame_time)
+        scheduler.update()
+
+def run_serial(scheduler, frame_time, zone_map, autoscaler):
+    if DETECTION_CACHE is not None:
+        blocking = [name for name, on in (("KEYFRAME_INTERVAL > 1", KEYFRAME_INTERVAL > 1),
+                                          ("LATENCY_BUDGET_MS", autoscaler is not None)) if on]
+        if blocking:
+            print(f"[CACHE] DETECTION_CACHE not used with {', '.join(blocking)}, ignoring")
+
+    if KEYFRAME_INTERVAL > 1:
+        frames = stream_keyframe_detections(VIDEO_PATH, KEYFRAME_INTERVAL)
+    else:
+        frames = stream_detections(VIDEO_PATH, HEADLESS, BATCH_SIZE, MAX_BATCH_WAIT,
+                                   COLUMNAR, ROI_ZONES, zone_map, autoscaler, DETECTION_CACHE)
+
+    tracker = None
+    if TRACKING:
+        blocking = [name for name, on in (("KEYFRAME_INTERVAL > 1", KEYFRAME_INTERVAL > 1),
+                                          ("COLUMNAR = False", not COLUMNAR)) if on]
+        if blocking:
+            print(f"[TRACKING] not available with {', '.join(blocking)}, ignoring")
+        else:
+            tracker = VehicleTracker(zone_map)
+
+    for i, frame in enumerate(frames):
+        arrival_rate = None
+        if tracker is not None:
+            tracker.update(frame, i * frame_time)
+            arrival_rate = tracker.arrival_rate()
+
+        on_decision(scheduler, analyze_frame(frame, arrival_rate, zone_map), frame_time)
+
+def run_pipelined(scheduler, frame_time, zone_map, autoscaler):
+    serial_only = [name for name, on in (("KEYFRAME_INTERVAL", KEYFRAME_INTERVAL > 1),
+                                         ("TRACKING", TRACKING),
+                                         ("DETECTION_CACHE", DETECTION_CACHE is not None)) if on]
+    if serial_only:
+        print(f"[PIPELINE] {', '.join(serial_only)} only apply with PIPELINED = False, ignoring")
+
+    pipeline = StagedPipeline(VIDEO_PATH, BATCH_SIZE, MAX_BATCH_WAIT,
+                              columnar=COLUMNAR, zone_map=zone_map, autoscaler=autoscaler,
+                              roi_zones=ROI_ZONES)
+
+    for i, (frame, signal_decision) in enumerate(pipeline, 1):
+        if i % REPORT_EVERY == 0:
+            print(f"[PIPELINE] {pipeline.stats()}")
+        on_decision(scheduler, signal_decision, frame_time)
+
+if __name__ == "__main__":
+    configure_model(MODEL_WEIGHTS, DEVICE)
+    startup_report(MODEL_WEIGHTS, DEVICE, WARMUP_RUNS, batch_size=BATCH_SIZE)
 
-        for d in frame:
-            zone = classify_zone(d["center"][1], d["frame_height"])
-            if zone == "QUEUE":
-                queue_zone_vehicles.append(d)
+    if TELEMETRY:
+        enable_telemetry(TELEMETRY_DB)
+    if METRICS:
+        metrics.enable()
+        metrics.start_exporter()
 
-        congestion = calculate_congestion(queue_zone_vehicles)
-        emergency = detect_emergency(frame)
+    scheduler = make_scheduler()
+    frame_time = 1.0 / video_fps(VIDEO_PATH)
+    zone_map = load_zone_map(CAMERA_ID)
 
-        add_congestion(congestion)
-        if emergency:
-            add_emergency()
+    autoscaler = None
+    if LATENCY_BUDGET_MS is not None:
+        autoscaler = LatencyAutoscaler(LATENCY_BUDGET_MS, device=DEVICE, batch_size=BATCH_SIZE)
 
-        signal_decision = decide_signal(congestion, emergency)
-        simulate_signal(signal_decision)
+    try:
+        if PIPELINED:
+            run_pipelined(scheduler, frame_time, zone_map, autoscaler)
+        else:
+            run_serial(scheduler, frame_time, zone_map, autoscaler)
+    finally:
+        scheduler.stop()
+        close_telemetry()
+        metrics.stop_exporter()
@@ -0,0 +1,253 @@
+"""
+Lightweight pipeline instrumentation: counters, gauges and fixed-bucket
+latency histograms, rendered in the Prometheus text format.
+
+Everything is off until enable() is called. While off, a @timed function
+pays one flag check and inline hooks are skipped behind `if
+metrics.ENABLED`, so the instrumentation can stay in the code.
+
+The pipeline and the dashboard are separate processes: the pipeline
+writes snapshots to METRICS_SNAPSHOT (start_exporter) and the dashboard's
+/metrics route renders them together with its own metrics.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+ENABLED = False
+
+# Seconds; fine steps below 10 ms for analytics, coarse ones for inference
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+STAGE_METRIC = "hemi_stage_seconds"
+
+# Snapshot shared by the pipeline process with the dashboard
+METRICS_SNAPSHOT = "metrics.json"
+EXPORT_INTERVAL = 5
+
+# name -> {"type", "help", "buckets", "children": {label tuple: metric}}
+_families = {}
+_lock = threading.Lock()
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def data(self):
+        return {"value": self.value}
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+class Histogram:
+    """
+    counts[i] holds observations <= buckets[i] and > buckets[i - 1];
+    the last slot is +Inf. Made cumulative only when rendered.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def observe_since(self, start):
+        self.observe(time.perf_counter() - start)
+
+    def data(self):
+        return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+def _metric(kind, name, help, labels, factory, buckets=None):
+    key = tuple(sorted(labels.items()))
+    family = _families.get(name)
+    if family is not None:
+        metric = family["children"].get(key)
+        if metric is not None:
+            return metric
+
+    with _lock:
+        family = _families.setdefault(name, {
+            "type": kind, "help": help, "buckets": buckets, "children": {},
+        })
+        if family["type"] != kind:
+            raise ValueError(f"metric {name} is already a {family['type']}")
+        return family["children"].setdefault(key, factory())
+
+def counter(name, help="", **labels):
+    return _metric("counter", name, help, labels, Counter)
+
+def gauge(name, help="", **labels):
+    return _metric("gauge", name, help, labels, Gauge)
+
+def histogram(name, help="", buckets=LATENCY_BUCKETS, **labels):
+    return _metric("histogram", name, help, labels,
+                   lambda: Histogram(buckets), buckets)
+
+def stage(name):
+    """
+    Latency histogram of one pipeline stage
+    """
+    return histogram(STAGE_METRIC, "Time spent per call in each pipeline stage", stage=name)
+
+def timed(stage_name):
+    """
+    Decorator recording every call's duration in stage(stage_name)
+    while metrics are enabled
+    """
+    hist = stage(stage_name)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorate
+
+# =========================
+# EXPOSITION
+# =========================
+def snapshot():
+    """
+    JSON-serializable copy of every metric
+    """
+    with _lock:
+        families = list(_families.items())
+
+    return {
+        name: {
+            "type": family["type"],
+            "help": family["help"],
+            "buckets": family["buckets"],
+            "samples": [[dict(key), metric.data()]
+                        for key, metric in list(family["children"].items())],
+        }
+        for name, family in families
+    }
+
+def _labels(labels, extra=None):
+    merged = {**labels, **(extra or {})}
+    if not merged:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in sorted(merged.items())
+    )
+    return "{" + body + "}"
+
+def render(sources):
+    """
+    Prometheus text format for a list of (extra labels, snapshot), e.g.
+    [({"process": "dashboard"}, snapshot()), ({"process": "pipeline"}, ...)].
+    Families with the same name are merged under one HELP/TYPE header.
+    """
+    merged = {}
+    for extra, snap in sources:
+        for name, family in snap.items():
+            entry = merged.setdefault(name, {**family, "samples": []})
+            entry["samples"].extend((labels, data, extra) for labels, data in family["samples"])
+
+    lines = []
+    for name in sorted(merged):
+        family = merged[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+
+        for labels, data, extra in family["samples"]:
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(labels, extra)} {data['value']}")
+                continue
+
+            cumulative = 0
+            bounds = [repr(float(b)) for b in family["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, data["counts"]):
+                cumulative += count
+                le = _labels({**labels, "le": bound}, extra)
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels, extra)} {data['sum']}")
+            lines.append(f"{name}_count{_labels(labels, extra)} {data['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def write_snapshot(path=METRICS_SNAPSHOT):
+    """
+    Atomically replace the snapshot file read by the dashboard
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"time": time.time(), "metrics": snapshot()}, f)
+    os.replace(tmp, path)
+
+def read_snapshot(path=METRICS_SNAPSHOT):
+    """
+    (time written, snapshot) or (None, {}) when there is none yet
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None, {}
+    return data["time"], data["metrics"]
+
+_exporter = None
+
+def start_exporter(path=METRICS_SNAPSHOT, interval=EXPORT_INTERVAL):
+    """
+    Pipeline side: write a snapshot every `interval` seconds
+    """
+    global _exporter
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            write_snapshot(path)
+
+    thread = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+    thread.start()
+    _exporter = (thread, stop, path)
+
+def stop_exporter():
+    global _exporter
+    if _exporter is None:
+        return
+    thread, stop, path = _exporter
+    stop.set()
+    thread.join(timeout=1)
+    write_snapshot(path)
+    _exporter = None
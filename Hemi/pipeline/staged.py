@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from vision.detector import (
+    infer, infer_roi, read_frames, extract_detections, extract_batch,
+    BATCH_SIZE, MAX_BATCH_WAIT, ROI_ZONES, ROI_PADDING
+)
+from pipeline.stages import analyze_frame
+
+# Bounded queue sizes between stages; a full queue blocks the producer
+DECODE_QUEUE_SIZE = 32
+RESULT_QUEUE_SIZE = 32
+
+_END = object()
+
+class StagedPipeline:
+    """
+    decode thread -> frame queue -> inference thread -> result queue -> analytics
+
+    Decode and post-processing overlap with inference instead of adding
+    to it. Analytics runs in the thread that iterates the pipeline.
+    Always headless: OpenCV windows are not safe off the main thread.
+    """
+
+    def __init__(self, video_path, batch_size=BATCH_SIZE, max_wait=MAX_BATCH_WAIT,
+                 decode_queue_size=DECODE_QUEUE_SIZE,
+                 result_queue_size=RESULT_QUEUE_SIZE, columnar=False, zone_map=None,
+                 autoscaler=None, roi_zones=ROI_ZONES):
+        self.video_path = video_path
+        self.roi_zones = roi_zones
+        self.autoscaler = autoscaler
+        self.extract = extract_batch if columnar else extract_detections
+        self.zone_map = zone_map
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+
+        self.frame_queue = queue.Queue(maxsize=decode_queue_size)
+        self.result_queue = queue.Queue(maxsize=result_queue_size)
+        self.stop_event = threading.Event()
+
+        self.counts = {"decoded": 0, "inferred": 0, "analyzed": 0}
+        self.peak_depths = {"decode": 0, "result": 0}
+        self.error = None
+
+        self.threads = [
+            threading.Thread(target=self._decode, name="decode", daemon=True),
+            threading.Thread(target=self._infer, name="inference", daemon=True),
+        ]
+
+    # -------------------------
+    # Stage workers
+    # -------------------------
+    def _put(self, q, item, depth_key):
+        # Blocking put (backpressure) that still notices a stop request
+        while not self.stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self.peak_depths[depth_key] = max(self.peak_depths[depth_key], q.qsize())
+            return True
+        return False
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            for frame in read_frames(cap):
+                if not self._put(self.frame_queue, frame, "decode"):
+                    return
+                self.counts["decoded"] += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self._put(self.frame_queue, _END, "decode")
+
+    def _next_batch(self):
+        first = self._get(self.frame_queue)
+        if first is _END:
+            return None, True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                frame = self.frame_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if frame is _END:
+                return batch, True
+            batch.append(frame)
+
+        return batch, False
+
+    def _infer(self):
+        try:
+            done = False
+            while not done and not self.stop_event.is_set():
+                frames, done = self._next_batch()
+                if not frames:
+                    break
+
+                start = time.perf_counter()
+                if self.roi_zones:
+                    results, crop, band = infer_roi(frames, self.roi_zones, ROI_PADDING,
+                                                    self.zone_map)
+                else:
+                    results, crop, band = infer(frames), None, None
+                if self.autoscaler is not None:
+                    self.autoscaler.observe(time.perf_counter() - start, len(frames))
+                for frame, result in zip(frames, results):
+                    item = (frame, result, crop, band)
+                    if not self._put(self.result_queue, item, "result"):
+                        return
+                    self.counts["inferred"] += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self.result_queue, _END, "result")
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def queue_depths(self):
+        """
+        Current and peak depth of each inter-stage queue. A queue that sits
+        near its limit means the stage after it is the bottleneck.
+        """
+        return {
+            "decode": self.frame_queue.qsize(),
+            "decode_peak": self.peak_depths["decode"],
+            "result": self.result_queue.qsize(),
+            "result_peak": self.peak_depths["result"],
+        }
+
+    def stats(self):
+        return {**self.counts, **self.queue_depths()}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def __iter__(self):
+        """
+        Yield (detections, signal_decision) per frame, in order
+        """
+        for t in self.threads:
+            t.start()
+
+        try:
+            while True:
+                item = self.result_queue.get()
+                if item is _END:
+                    break
+
+                frame, result, crop, band = item
+                detections = self.extract(result, frame.shape[0], crop, band)
+                decision = analyze_frame(detections, zone_map=self.zone_map)
+                self.counts["analyzed"] += 1
+
+                yield detections, decision
+        finally:
+            self.stop()
+            for t in self.threads:
+                t.join(timeout=1)
+
+        if self.error is not None:
+            raise self.error
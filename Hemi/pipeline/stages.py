@@ -0,0 +1,60 @@
+from vision.zone_mapper import classify_zone, classify_zones, QUEUE
+from vision.detections import DetectionBatch
+from analytics.congestion import (
+    calculate_congestion, calculate_congestion_batch, calculate_zone_congestion
+)
+from analytics.emergency import detect_emergency, detect_emergency_batch
+from signal_control.optimizer import decide_signal
+from dashboard.data_store import add_congestion, add_emergency
+
+def queue_congestion(frame, zone_map=None):
+    """
+    Congestion score of the vehicles in the QUEUE zone of one frame
+    (list of dicts or DetectionBatch). With a ZoneMap, the queue is the
+    union of its queue zones.
+    """
+    if zone_map is not None:
+        return zone_queue_congestion(frame, zone_map)
+
+    if isinstance(frame, DetectionBatch):
+        zones = classify_zones(frame.centers()[:, 1], frame.frame_height)
+        return calculate_congestion_batch(frame.select(zones == QUEUE))
+
+    queue_zone_vehicles = []
+
+    for d in frame:
+        zone = classify_zone(d["center"][1], d["frame_height"])
+        if zone == "QUEUE":
+            queue_zone_vehicles.append(d)
+
+    return calculate_congestion(queue_zone_vehicles)
+
+def zone_queue_congestion(frame, zone_map):
+    if not isinstance(frame, DetectionBatch):
+        centers = [d["center"] for d in frame]
+        labels = zone_map.classify(centers)
+        return calculate_congestion([d for d, q in zip(frame, zone_map.in_queue(labels)) if q])
+
+    labels = zone_map.classify(frame.centers())
+    per_zone = calculate_zone_congestion(frame, labels, len(zone_map.names))
+    score = float(per_zone[zone_map.queue_labels].sum())
+    return int(score) if score.is_integer() else score
+
+def frame_emergency(frame):
+    if isinstance(frame, DetectionBatch):
+        return detect_emergency_batch(frame)
+    return detect_emergency(frame)
+
+def analyze_frame(frame, arrival_rate=None, zone_map=None):
+    """
+    Analytics/decision step for one frame of detections:
+    queue-zone congestion, emergency check, store update and signal decision
+    """
+    congestion = queue_congestion(frame, zone_map)
+    emergency = frame_emergency(frame)
+
+    add_congestion(congestion)
+    if emergency:
+        add_emergency()
+
+    return decide_signal(congestion, emergency, arrival_rate)
@@ -0,0 +1,508 @@
+"""
+Congestion-aware route engine.
+
+    python -m routing.engine --grid 150 --queries 2000
+    python -m routing.engine --graph road_graph.json --route 0 11 --sink stream_results.jsonl
+
+Queries run A* with ALT lower bounds (landmarks + triangle inequality).
+A congestion update re-customizes the landmarks: their one-to-all and
+all-to-one travel times are recomputed on the live costs (2 x LANDMARKS
+csgraph Dijkstras), which keeps the bounds tight under congestion. A
+query takes the ACTIVE_LANDMARKS bounds best for its O-D pair as the
+potential h and runs one csgraph Dijkstra on the reduced costs
+c(u, v) + h(v) - h(u) >= 0, which is A* with the search loop in C, cut
+off at the radius where the target settles. Without scipy, queries fall
+back to a Python A* on landmark tables computed once on free-flow times
+(live costs only scale those up, so the bounds stay valid).
+
+Answered routes are cached and never flushed wholesale on an update: a
+cached route is served while its current travel time is within
+1 + REUSE_TOLERANCE of the landmark lower bound for its O-D pair, so it
+is never more than REUSE_TOLERANCE slower than the best route, and is
+recomputed otherwise.
+"""
+import argparse
+import heapq
+import json
+import time
+from array import array
+
+import numpy as np
+
+from routing.graph import load_graph, grid_city, ROAD_GRAPH
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:
+    csr_matrix = None
+
+LANDMARKS = 16
+# Landmarks used per query (the ones with the best bound for its O-D pair)
+ACTIVE_LANDMARKS = 8
+
+# Congestion score that doubles an edge's travel time
+CONGESTION_SCALE = 20.0
+# Smoothing of camera scores between updates
+SMOOTHING = 0.3
+
+# Cached routes at most this fraction above the O-D lower bound are reused
+REUSE_TOLERANCE = 0.05
+CACHE_SIZE = 100000
+
+# First search radius in reduced costs, as a share of the O-D lower bound,
+# grown SEARCH_GROWTH-fold until the target settles
+SEARCH_RADIUS = 0.01
+SEARCH_GROWTH = 2.0
+
+# Cached result for O-D pairs with no route
+_NO_ROUTE = None
+
+# Stands in for "unreachable" in landmark tables (inf - inf would be nan)
+_FAR = 1e15
+
+def _to_array(values):
+    out = array("d")
+    out.frombytes(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return out
+
+def cheapest_edges(graph, costs):
+    """
+    Index of the cheapest edge of each (tail, head) pair, ordered by tail
+    then head, so parallel edges collapse to one
+    """
+    key = graph.tails * graph.num_nodes + graph.heads
+    order = np.lexsort((costs, key))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = key[order][1:] != key[order][:-1]
+    return order[first]
+
+def shortest_distances(graph, sources, costs, reverse=False):
+    """
+    One-to-all travel times from each source (to each source when
+    reverse=True) -> (len(sources), num_nodes), inf when unreachable
+    """
+    n = graph.num_nodes
+    if csr_matrix is not None:
+        pick = cheapest_edges(graph, costs)
+        matrix = csr_matrix((costs[pick], (graph.tails[pick], graph.heads[pick])), shape=(n, n))
+        if reverse:
+            matrix = matrix.T.tocsr()
+        return csgraph_dijkstra(matrix, directed=True, indices=list(sources))
+
+    if reverse:
+        indptr, edges = graph.reversed_csr()
+        other = graph.tails
+    else:
+        indptr, edges = graph.indptr, np.arange(graph.num_edges)
+        other = graph.heads
+
+    result = np.full((len(sources), n), np.inf)
+    for row, source in enumerate(sources):
+        dist = result[row]
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for e in edges[indptr[u]:indptr[u + 1]]:
+                v = other[e]
+                nd = d + costs[e]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+    return result
+
+def select_landmarks(graph, count=LANDMARKS, seed=0):
+    """
+    Farthest-point selection on free-flow times: each new landmark is the
+    node farthest from the ones chosen so far
+    """
+    rng = np.random.default_rng(seed)
+    start = int(rng.integers(graph.num_nodes))
+    nearest = shortest_distances(graph, [start], graph.free_flow)[0]
+    chosen = []
+    for _ in range(min(count, graph.num_nodes)):
+        reachable = np.where(np.isfinite(nearest), nearest, -1.0)
+        node = int(np.argmax(reachable))
+        chosen.append(node)
+        dist = shortest_distances(graph, [node], graph.free_flow)[0]
+        nearest = np.minimum(nearest, dist)
+        nearest[node] = -1.0
+    return chosen
+
+class RouteEngine:
+    def __init__(self, graph, landmarks=LANDMARKS, seed=0):
+        self.graph = graph
+        self.congestion = np.zeros(graph.num_edges)
+        self.costs = graph.free_flow.copy()
+
+        # Plain Python containers for the fallback search loop
+        self._indptr = array("q", graph.indptr.tolist())
+        self._heads = array("q", graph.heads.tolist())
+        self._costs = self.costs.tolist()
+
+        start = time.perf_counter()
+        self.landmarks = select_landmarks(graph, landmarks, seed)
+        self._customize()
+        self._from_rows = [_to_array(row) for row in self.from_lm]
+        self._to_rows = [_to_array(row) for row in self.to_lm]
+        self.preprocess_time = time.perf_counter() - start
+
+        # (origin, target) -> (edges, version of the costs it was found on)
+        self.cache = {}
+        self.version = 0
+        self.stats = {"queries": 0, "cache_hits": 0, "stale": 0, "settled": 0}
+
+    def _customize(self):
+        """
+        Landmark tables on the current costs and, with scipy, the
+        matrix csgraph searches run on
+        """
+        graph = self.graph
+        n = graph.num_nodes
+        from_lm = shortest_distances(graph, self.landmarks, self.costs)
+        to_lm = shortest_distances(graph, self.landmarks, self.costs, reverse=True)
+        self.from_lm = np.where(np.isfinite(from_lm), from_lm, _FAR)   # d(L, v)
+        self.to_lm = np.where(np.isfinite(to_lm), to_lm, _FAR)         # d(v, L)
+
+        # Potentials up to a per-target constant: pi(v) - pi(t) <= d(v, t)
+        # for pi = d(., L) and for pi = -d(L, .), nan where L is out of
+        # reach, plus a zero potential for pairs no landmark bounds
+        potentials = np.concatenate([to_lm, -from_lm, np.zeros((1, n))])
+        potentials[~np.isfinite(potentials)] = np.nan
+        self._potentials = potentials
+        self._node_potentials = np.ascontiguousarray(potentials.T)
+        if csr_matrix is None:
+            return
+
+        # One search matrix over distinct (tail, head) pairs; its weights
+        # are rewritten per query
+        pick = cheapest_edges(graph, self.costs)
+        self._pair_edges = pick
+        self._pair_costs = self.costs[pick]
+        self._pair_tails = graph.tails[pick]
+        self._pair_heads = graph.heads[pick]
+        self._pair_keys = self._pair_tails * n + self._pair_heads
+        indptr = np.searchsorted(self._pair_tails, np.arange(n + 1))
+        self._matrix = csr_matrix((self._pair_costs.copy(), self._pair_heads, indptr), shape=(n, n))
+        # Per-query scratch: potential, one landmark's term, weights (the
+        # matrix's data) and gathered potentials
+        self._buffers = (np.empty(n), np.empty(n), self._matrix.data, np.empty(len(pick)))
+
+    # -------------------------
+    # Live costs
+    # -------------------------
+    def set_edge_congestion(self, edges, scores):
+        """
+        New congestion scores for some edges (smoothed), then their costs
+        and the landmarks
+        """
+        edges = np.atleast_1d(np.asarray(edges, dtype=np.int64))
+        scores = np.broadcast_to(np.asarray(scores, dtype=np.float64), edges.shape)
+        current = self.congestion[edges]
+        self.congestion[edges] = current + SMOOTHING * (scores - current)
+
+        new = self.graph.free_flow[edges] * (1.0 + np.maximum(self.congestion[edges], 0.0)
+                                             / CONGESTION_SCALE)
+        self.costs[edges] = new
+        for e, cost in zip(edges.tolist(), new.tolist()):
+            self._costs[e] = cost
+        self.version += 1
+        # The Python fallback keeps its free-flow tables: recomputing them
+        # would cost seconds per update
+        if csr_matrix is not None:
+            self._customize()
+
+    def set_junction_congestion(self, node, score):
+        """
+        Apply one junction-level score to every approach of the junction
+        """
+        self.set_edge_congestion(self.graph.incoming(node), score)
+
+    def apply_records(self, records):
+        """
+        Supervisor sink records ({"type": "frame", "camera", "congestion"})
+        -> mean score per mapped camera -> edge update
+        """
+        totals = {}
+        for record in records:
+            edge = self.graph.cameras.get(record.get("camera"))
+            if record.get("type") != "frame" or edge is None:
+                continue
+            total = totals.setdefault(edge, [0.0, 0])
+            total[0] += record["congestion"]
+            total[1] += 1
+
+        if totals:
+            edges = list(totals)
+            self.set_edge_congestion(edges, [totals[e][0] / totals[e][1] for e in edges])
+        return len(totals)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def _pair_bounds(self, origin, target):
+        # Lower bound from each potential, -inf where it does not apply
+        bounds = self._node_potentials[origin] - self._node_potentials[target]
+        return np.nan_to_num(bounds, nan=-np.inf)
+
+    def lower_bound(self, origin, target):
+        """
+        Landmark lower bound on the travel time origin -> target
+        """
+        return float(self._pair_bounds(origin, target).max())
+
+    def _bound(self, active, target):
+        from_rows = [self._from_rows[l] for l in active]
+        to_rows = [self._to_rows[l] for l in active]
+        pairs = [(f, t, f[target], t[target]) for f, t in zip(from_rows, to_rows)]
+        bounds = {}
+
+        def h(v):
+            value = bounds.get(v)
+            if value is None:
+                value = 0.0
+                for f, t, f_target, t_target in pairs:
+                    # d(v, t) >= d(v, L) - d(t, L) and >= d(L, t) - d(L, v)
+                    b = t[v] - t_target
+                    if b > value:
+                        value = b
+                    b = f_target - f[v]
+                    if b > value:
+                        value = b
+                bounds[v] = value
+            return value
+
+        return h
+
+    def _active_landmarks(self, origin, target):
+        bounds = np.maximum(self.to_lm[:, origin] - self.to_lm[:, target],
+                            self.from_lm[:, target] - self.from_lm[:, origin])
+        return np.argsort(-bounds)[:ACTIVE_LANDMARKS].tolist()
+
+    def _search(self, origin, target):
+        h = self._bound(self._active_landmarks(origin, target), target)
+        indptr, heads, costs = self._indptr, self._heads, self._costs
+        dist = {origin: 0.0}
+        parent = {origin: -1}
+        closed = set()
+        heap = [(h(origin), 0.0, origin)]
+        found = False
+
+        while heap:
+            _, g, u = heapq.heappop(heap)
+            if u == target:
+                found = True
+                break
+            if u in closed:
+                continue
+            closed.add(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = heads[e]
+                ng = g + costs[e]
+                if ng < dist.get(v, float("inf")):
+                    dist[v] = ng
+                    parent[v] = e
+                    heapq.heappush(heap, (ng + h(v), ng, v))
+
+        self.stats["settled"] += len(closed)
+        if not found:
+            return _NO_ROUTE
+
+        edges = []
+        node = target
+        while parent[node] != -1:
+            e = parent[node]
+            edges.append(e)
+            node = int(self.graph.tails[e])
+        edges.reverse()
+        return edges
+
+    def _search_csgraph(self, origin, target):
+        # A* as Dijkstra on reduced costs c(u, v) + h(v) - h(u), h the
+        # best ACTIVE_LANDMARKS bounds (a max of consistent potentials
+        # is consistent). Rows used have finite bounds, so a node where
+        # one is nan can reach (or be reached from) neither end.
+        bounds = self._pair_bounds(origin, target)
+        rows = np.argsort(-bounds)[:ACTIVE_LANDMARKS]
+        rows = rows[bounds[rows] > -np.inf]
+        h = np.zeros(self.graph.num_nodes)
+        for row in rows.tolist():
+            np.fmax(h, self._potentials[row] - self._potentials[row, target], out=h)
+        weights = self._pair_costs + h[self._pair_heads]
+        weights -= h[self._pair_tails]
+        np.maximum(weights, 0.0, out=weights)
+        self._matrix.data = weights
+
+        radius = SEARCH_RADIUS * h[origin] + 1.0
+        reached = -1
+
+        # Every node within the radius is settled exactly, so the target
+        # is final once it is within it. The target is unreachable once
+        # a radius adds no node and no edge leaves the settled ones.
+        while True:
+            dist, pred = csgraph_dijkstra(self._matrix, indices=origin, limit=radius,
+                                          return_predecessors=True)
+            if dist[target] < np.inf:
+                break
+            settled = dist < np.inf
+            count = int(np.count_nonzero(settled))
+            if count == reached and not np.any(settled[self._pair_tails] & ~settled[self._pair_heads]
+                                               & (weights < np.inf)):
+                break
+            reached = count
+            radius *= SEARCH_GROWTH
+
+        self.stats["settled"] += int(np.count_nonzero(dist < np.inf))
+        if dist[target] == np.inf:
+            return _NO_ROUTE
+
+        nodes = [target]
+        node = target
+        while node != origin:
+            node = int(pred[node])
+            nodes.append(node)
+        nodes = np.asarray(nodes[::-1], dtype=np.int64)
+        keys = nodes[:-1] * self.graph.num_nodes + nodes[1:]
+        return self._pair_edges[np.searchsorted(self._pair_keys, keys)].tolist()
+
+    def route(self, origin, target):
+        """
+        Fastest route under current costs (within REUSE_TOLERANCE when
+        served from the cache), or None when unreachable. Returns nodes,
+        edges, travel time (s), free-flow time and length.
+        """
+        self.stats["queries"] += 1
+        key = (origin, target)
+        entry = self.cache.get(key)
+        edges = idx = None
+        cached = False
+
+        if entry is not None:
+            edges, version = entry
+            # Costs are always finite, so "no route" never goes stale
+            if edges is _NO_ROUTE or version == self.version:
+                cached = True
+            else:
+                idx = np.asarray(edges, dtype=np.int64)
+                cost = self.costs[idx].sum()
+                cached = bool(cost <= (1.0 + REUSE_TOLERANCE) * self.lower_bound(origin, target))
+                if not cached:
+                    self.stats["stale"] += 1
+
+        if cached:
+            self.stats["cache_hits"] += 1
+        else:
+            if csr_matrix is not None:
+                edges = self._search_csgraph(origin, target)
+            else:
+                edges = self._search(origin, target)
+            idx = None
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            self.cache[key] = (edges, self.version)
+
+        if edges is _NO_ROUTE:
+            return None
+
+        if idx is None:
+            idx = np.asarray(edges, dtype=np.int64)
+        nodes = [origin] + self.graph.heads[idx].tolist()
+        return {
+            "origin": origin,
+            "destination": target,
+            "nodes": nodes,
+            "edges": edges,
+            "travel_time": round(float(self.costs[idx].sum()), 1),
+            "free_flow_time": round(float(self.graph.free_flow[idx].sum()), 1),
+            "length": round(float(self.graph.lengths[idx].sum()), 1),
+            "cached": cached,
+        }
+
+class SinkFeed:
+    """
+    Follows the supervisor's JSONL sink, returning records appended since
+    the previous poll()
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def poll(self):
+        records = []
+        try:
+            with open(self.path) as f:
+                f.seek(self.offset)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    self.offset += len(line.encode())
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+# =========================
+# BENCHMARK
+# =========================
+def benchmark(engine, queries, updates_every=500, repeat_share=0.5, seed=0):
+    """
+    Random O-D queries with a congestion update (5% of edges) every
+    `updates_every` queries; `repeat_share` of queries reuse earlier pairs
+    """
+    rng = np.random.default_rng(seed)
+    n = engine.graph.num_nodes
+    pairs = rng.integers(0, n, size=(queries, 2))
+    pool = max(1, queries // 20)
+    repeat = rng.random(queries) < repeat_share
+    pairs[repeat] = pairs[rng.integers(0, pool, repeat.sum())]
+
+    update_time = 0.0
+    start = time.perf_counter()
+    for i, (o, d) in enumerate(pairs.tolist()):
+        if updates_every and i and i % updates_every == 0:
+            t = time.perf_counter()
+            edges = rng.choice(engine.graph.num_edges, engine.graph.num_edges // 20, replace=False)
+            engine.set_edge_congestion(edges, rng.uniform(0, 40, len(edges)))
+            update_time += time.perf_counter() - t
+        engine.route(o, d)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "queries": queries,
+        "queries_per_s": round(queries / (elapsed - update_time), 1),
+        "update_ms": round(update_time * 1000 / max(1, queries // max(updates_every, 1)), 2),
+        **engine.stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Congestion-aware routing")
+    parser.add_argument("--graph", help=f"road graph JSON (e.g. {ROAD_GRAPH})")
+    parser.add_argument("--grid", type=int, default=150, help="synthetic N x N city when no --graph")
+    parser.add_argument("--landmarks", type=int, default=LANDMARKS)
+    parser.add_argument("--route", type=int, nargs=2, metavar=("FROM", "TO"))
+    parser.add_argument("--sink", help="apply congestion from the supervisor's JSONL sink first")
+    parser.add_argument("--queries", type=int, default=2000, help="benchmark query count")
+    args = parser.parse_args()
+
+    graph = load_graph(args.graph) if args.graph else grid_city(args.grid, args.grid)
+    engine = RouteEngine(graph, args.landmarks)
+    print(f"[ROUTING] {graph.num_nodes} nodes, {graph.num_edges} edges, "
+          f"{len(engine.landmarks)} landmarks in {engine.preprocess_time:.2f} s")
+
+    if args.sink:
+        print(f"[ROUTING] congestion from {engine.apply_records(SinkFeed(args.sink).poll())} cameras")
+
+    if args.route:
+        print(json.dumps(engine.route(*args.route), indent=2))
+    else:
+        print(json.dumps(benchmark(engine, args.queries), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Directed road graph in CSR form (NumPy arrays), loaded from a local JSON
+file or generated as a synthetic city grid for testing.
+
+road_graph.json:
+    {"nodes": [[x, y], ...],                       metres, node id = index
+     "edges": [[from, to, length_m, speed_kmh], ...],
+     "cameras": {"<camera id>": [from, to], ...}}  camera -> watched edge
+"""
+import json
+
+import numpy as np
+
+ROAD_GRAPH = "road_graph.json"
+
+class RoadGraph:
+    """
+    Edges are sorted by tail node; out-edges of node u are
+    indptr[u]:indptr[u + 1]. Edge ids refer to that order.
+    """
+
+    def __init__(self, coords, tails, heads, lengths, speeds_kmh, cameras=None):
+        order = np.lexsort((heads, tails))
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.num_nodes = len(self.coords)
+        self.tails = np.asarray(tails, dtype=np.int64)[order]
+        self.heads = np.asarray(heads, dtype=np.int64)[order]
+        self.lengths = np.asarray(lengths, dtype=np.float64)[order]
+        self.speeds = np.asarray(speeds_kmh, dtype=np.float64)[order] / 3.6
+        self.free_flow = self.lengths / self.speeds          # s
+        self.indptr = np.searchsorted(self.tails, np.arange(self.num_nodes + 1))
+
+        # camera id -> edge id
+        self.cameras = {}
+        for camera, (u, v) in (cameras or {}).items():
+            self.cameras[camera] = self.edge_id(u, v)
+
+    @property
+    def num_edges(self):
+        return len(self.tails)
+
+    def edge_id(self, u, v):
+        start, end = self.indptr[u], self.indptr[u + 1]
+        hit = np.flatnonzero(self.heads[start:end] == v)
+        if len(hit) == 0:
+            raise KeyError(f"no edge {u} -> {v}")
+        return int(start + hit[0])
+
+    def incoming(self, node):
+        """
+        Edge ids ending at node (e.g. all approaches of a junction)
+        """
+        return np.flatnonzero(self.heads == node)
+
+    def reversed_csr(self):
+        """
+        (indptr, edge ids) of in-edges per node, for backward searches
+        """
+        order = np.argsort(self.heads, kind="stable")
+        indptr = np.searchsorted(self.heads[order], np.arange(self.num_nodes + 1))
+        return indptr, order
+
+def load_graph(path=ROAD_GRAPH):
+    with open(path) as f:
+        data = json.load(f)
+
+    edges = np.asarray(data["edges"], dtype=np.float64).reshape(-1, 4)
+    return RoadGraph(
+        data["nodes"],
+        edges[:, 0].astype(np.int64),
+        edges[:, 1].astype(np.int64),
+        edges[:, 2],
+        edges[:, 3],
+        data.get("cameras"),
+    )
+
+def grid_city(rows, cols, spacing=150.0, arterial_every=5, drop=0.05, seed=0):
+    """
+    Synthetic city: a rows x cols grid of two-way streets (30-50 km/h)
+    with faster arterials every `arterial_every` rows/columns and a
+    fraction `drop` of street segments removed
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    ys, xs = np.divmod(np.arange(rows * cols), cols)
+    coords = np.stack([xs * spacing, ys * spacing], axis=1)
+
+    horizontal = np.stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()], axis=1)
+    vertical = np.stack([ids[:-1, :].ravel(), ids[1:, :].ravel()], axis=1)
+    h_speed = np.where(np.repeat(np.arange(rows), cols - 1) % arterial_every == 0, 60.0, 0.0)
+    v_speed = np.where(np.tile(np.arange(cols), rows - 1) % arterial_every == 0, 60.0, 0.0)
+
+    pairs = np.concatenate([horizontal, vertical])
+    speeds = np.concatenate([h_speed, v_speed])
+    local = speeds == 0
+    speeds[local] = rng.uniform(30, 50, local.sum())
+
+    keep = (speeds > 50) | (rng.random(len(pairs)) >= drop)
+    pairs, speeds = pairs[keep], speeds[keep]
+    lengths = spacing * rng.uniform(1.0, 1.15, len(pairs))
+
+    tails = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    heads = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    return RoadGraph(coords, tails, heads, np.tile(lengths, 2), np.tile(speeds, 2))
@@ -1,19 +1,44 @@
-def decide_signal(congestion_score, emergency=False):
+from monitoring import metrics
+
+EMERGENCY_REASON = "Emergency Vehicle Priority"
+
+# Green seconds per congestion point, clamped to [MIN_GREEN, MAX_GREEN]
+CONGESTION_GAIN = 2
+MIN_GREEN = 10
+MAX_GREEN = 60
+EMERGENCY_GREEN = 60
+
+# Extra green seconds per vehicle/minute arriving at the queue
+ARRIVAL_WEIGHT = 0.5
+
+@metrics.timed("decision")
+def decide_signal(congestion_score, emergency=False, arrival_rate=None,
+                  gain=CONGESTION_GAIN, min_green=MIN_GREEN, max_green=MAX_GREEN,
+                  arrival_weight=ARRIVAL_WEIGHT):
     """
-    Core decision logic
+    Core decision logic.
+    arrival_rate (vehicles/min entering the queue, from the tracker)
+    extends green for traffic still approaching. The tuning constants can
+    be overridden per call (see simulation.sweep).
     """
     if emergency:
         return {
             "signal": "GREEN",
-            "green_time": 60,
-            "reason": "Emergency Vehicle Priority"
+            "green_time": EMERGENCY_GREEN,
+            "reason": EMERGENCY_REASON
         }
 
     # Adaptive timing
-    green_time = min(60, max(10, congestion_score * 2))
+    demand = congestion_score * gain
+    reason = "Adaptive Congestion Control"
+    if arrival_rate is not None:
+        demand += arrival_rate * arrival_weight
+        reason = "Adaptive Congestion + Arrival Control"
+
+    green_time = min(max_green, max(min_green, demand))
 
     return {
         "signal": "GREEN",
         "green_time": green_time,
-        "reason": "Adaptive Congestion Control"
+        "reason": reason
     }
@@ -0,0 +1,236 @@
+"""
+Multi-phase signal plans for four-way junctions, many junctions at once.
+
+decide_signal() stretches one green from one score. JunctionPlanner takes
+per-approach arrival rates and queue scores and computes a full plan per
+junction (cycle length and a green split per phase, respecting minimum
+and pedestrian greens) with one of the policies:
+
+    webster         cycle and splits from the critical flow ratios
+                    (Webster's optimum cycle)
+    pressure-split  fixed cycle, splits proportional to each phase's
+                    pressure: saturation flow x (queue upstream - downstream)
+    max-pressure    no fixed cycle: at every decision point (once the
+                    current phase has had its minimum green) next_phase()
+                    gives the green to the phase with the highest
+                    pressure. Its published plan is the pressure-split one,
+                    for reporting only.
+
+State is kept as (junctions, approaches) arrays; update() records new
+measurements for some junctions and replan() recomputes only those, in
+one vectorized pass.
+"""
+import numpy as np
+
+APPROACHES = ("N", "S", "E", "W")
+
+# Phase name -> approaches that get green together
+PHASES = {"NS": ("N", "S"), "EW": ("E", "W")}
+
+SATURATION_FLOW = 1800   # veh/h per lane
+LOST_TIME = 4            # s per phase (start-up + clearance)
+MIN_CYCLE = 40
+MAX_CYCLE = 150
+MIN_GREEN = 7
+
+# Pedestrian minimum green: walk interval plus crossing time
+PED_WALK = 7
+CROSSING_LENGTH = 14     # m
+PED_SPEED = 1.2          # m/s
+
+# Pressure-split runs a fixed cycle and only moves the splits
+PRESSURE_CYCLE = 90
+
+# Exponential smoothing of arrival rates between measurements
+SMOOTHING = 0.3
+
+# Plan changes smaller than this (s) are not published
+PLAN_TOLERANCE = 1.0
+
+POLICIES = ("webster", "pressure-split", "max-pressure")
+
+class JunctionPlanner:
+    def __init__(self, junctions, policy="webster", phases=PHASES, lanes=1,
+                 pedestrians=True, saturation_flow=SATURATION_FLOW):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy '{policy}', expected one of {POLICIES}")
+
+        self.policy = policy
+        self.n = junctions
+        self.phase_names = tuple(phases)
+        # (phases, approaches) membership
+        self.phase_matrix = np.array(
+            [[a in phases[p] for a in APPROACHES] for p in self.phase_names], dtype=bool
+        )
+
+        shape = (junctions, len(APPROACHES))
+        self.lanes = np.broadcast_to(np.asarray(lanes, dtype=np.float64), shape).copy()
+        self.saturation = self.lanes * saturation_flow           # veh/h
+        self.arrivals = np.zeros(shape)                          # veh/h, smoothed
+        self.queues = np.zeros(shape)                            # congestion score
+        self.downstream = np.zeros(shape)
+
+        pedestrians = np.broadcast_to(np.asarray(pedestrians, dtype=bool), (junctions,))
+        ped_green = max(MIN_GREEN, PED_WALK + CROSSING_LENGTH / PED_SPEED)
+        self.min_green = np.where(pedestrians[:, None], ped_green, MIN_GREEN) \
+            * np.ones((1, len(self.phase_names)))
+
+        self.lost_time = LOST_TIME * len(self.phase_names)
+        # Equal split of the minimum cycle until the first measurements,
+        # held to the same minimum / pedestrian greens as later plans
+        self.green = np.maximum(self._equal_split(MIN_CYCLE)[None], self.min_green)
+        self.cycle = self.green.sum(axis=1) + self.lost_time
+        self.flow_ratio = np.zeros(junctions)
+        self.dirty = np.ones(junctions, dtype=bool)
+
+    def _equal_split(self, cycle):
+        return np.full(len(self.phase_names), (cycle - self.lost_time) / len(self.phase_names))
+
+    # -------------------------
+    # Measurements
+    # -------------------------
+    def update(self, junctions, arrival_rates=None, queues=None, downstream=None):
+        """
+        New measurements for the given junction indexes, each a
+        (len(junctions), 4) array in N S E W order: arrival_rates in
+        vehicles/min (as from VehicleTracker.arrival_rate), queues as
+        congestion scores, downstream as the queue on each approach's
+        exit link (pressure policies only)
+        """
+        junctions = np.atleast_1d(np.asarray(junctions))
+        if arrival_rates is not None:
+            rates = np.asarray(arrival_rates, dtype=np.float64) * 60.0
+            current = self.arrivals[junctions]
+            self.arrivals[junctions] = current + SMOOTHING * (rates - current)
+        if queues is not None:
+            self.queues[junctions] = queues
+        if downstream is not None:
+            self.downstream[junctions] = downstream
+        self.dirty[junctions] = True
+
+    # -------------------------
+    # Planning
+    # -------------------------
+    def _phase_max(self, values):
+        # (J, A) -> (J, P): largest value among each phase's approaches
+        return np.where(self.phase_matrix[None], values[:, None, :], 0.0).max(axis=2)
+
+    def _webster(self, idx):
+        y = self.arrivals[idx] / self.saturation[idx]
+        critical = self._phase_max(y)
+        total = critical.sum(axis=1)
+
+        lost = self.lost_time
+        with np.errstate(divide="ignore"):
+            optimum = np.where(total < 0.95, (1.5 * lost + 5) / (1 - total), MAX_CYCLE)
+        cycle = np.clip(optimum, MIN_CYCLE, MAX_CYCLE)
+
+        share = np.where(total[:, None] > 0, critical / np.maximum(total, 1e-9)[:, None],
+                         1.0 / len(self.phase_names))
+        return cycle, share, total
+
+    def pressures(self, idx):
+        """
+        (len(idx), phases) pressure of each phase: vehicles per hour it
+        could discharge, weighted by how much more is queued upstream
+        than downstream
+        """
+        pressure = self.saturation[idx] * np.maximum(self.queues[idx] - self.downstream[idx], 0.0)
+        return pressure @ self.phase_matrix.T.astype(np.float64)
+
+    def next_phases(self, idx, current):
+        """
+        Max-pressure decision for junctions idx whose phases `current`
+        have served their minimum green: the highest-pressure phase,
+        keeping the current one on ties
+        """
+        idx = np.atleast_1d(np.asarray(idx))
+        current = np.broadcast_to(np.asarray(current), idx.shape)
+        phase_pressure = self.pressures(idx)
+        best = phase_pressure.argmax(axis=1)
+        keep = phase_pressure[np.arange(len(idx)), current] >= phase_pressure.max(axis=1)
+        return np.where(keep, current, best)
+
+    def next_phase(self, j, current):
+        """
+        Phase index that should be green at junction j after the
+        current phase's minimum green (max-pressure)
+        """
+        return int(self.next_phases([j], current)[0])
+
+    def _pressure_split(self, idx):
+        phase_pressure = self.pressures(idx)
+        total = phase_pressure.sum(axis=1)
+
+        share = np.where(total[:, None] > 0, phase_pressure / np.maximum(total, 1e-9)[:, None],
+                         1.0 / len(self.phase_names))
+        cycle = np.full(len(idx), float(PRESSURE_CYCLE))
+        ratio = self._phase_max(self.arrivals[idx] / self.saturation[idx]).sum(axis=1)
+        return cycle, share, ratio
+
+    def replan(self):
+        """
+        Recompute plans of junctions with new measurements. Returns the
+        indexes whose published plan changed by more than PLAN_TOLERANCE.
+        """
+        idx = np.flatnonzero(self.dirty)
+        if len(idx) == 0:
+            return idx
+        self.dirty[idx] = False
+
+        if self.policy == "webster":
+            cycle, share, ratio = self._webster(idx)
+        else:
+            cycle, share, ratio = self._pressure_split(idx)
+
+        # Effective green, then minimum / pedestrian greens; a cycle too
+        # short for the minimums is lengthened
+        green = np.maximum((cycle - self.lost_time)[:, None] * share, self.min_green[idx])
+        cycle = green.sum(axis=1) + self.lost_time
+
+        changed = (np.abs(cycle - self.cycle[idx]) > PLAN_TOLERANCE) | \
+            (np.abs(green - self.green[idx]) > PLAN_TOLERANCE).any(axis=1)
+        publish = idx[changed]
+        self.cycle[publish] = cycle[changed]
+        self.green[publish] = green[changed]
+        self.flow_ratio[idx] = ratio
+        return publish
+
+    # -------------------------
+    # Output
+    # -------------------------
+    def capacity(self, j):
+        """
+        Vehicles/hour each approach can discharge under the current plan
+        """
+        green_per_approach = self.green[j] @ self.phase_matrix.astype(np.float64)
+        return self.saturation[j] * green_per_approach / self.cycle[j]
+
+    def plan(self, j):
+        phases = []
+        for p, name in enumerate(self.phase_names):
+            approaches = [a for a, on in zip(APPROACHES, self.phase_matrix[p]) if on]
+            phases.append({"phase": name, "approaches": approaches,
+                           "green_time": round(float(self.green[j, p]), 1)})
+        return {
+            "policy": self.policy,
+            "cycle": round(float(self.cycle[j]), 1),
+            "phases": phases,
+            "flow_ratio": round(float(self.flow_ratio[j]), 3),
+        }
+
+    def decisions(self, j):
+        """
+        The plan as decide_signal()-style decisions, one per phase in order,
+        for SignalScheduler
+        """
+        reason = {
+            "webster": "Webster Phase Plan",
+            "pressure-split": "Pressure-Split Phase Plan",
+            "max-pressure": "Max-Pressure Nominal Plan",
+        }[self.policy]
+        return [
+            {"signal": "GREEN", "green_time": phase["green_time"], "reason": reason,
+             "direction": phase["phase"]}
+            for phase in self.plan(j)["phases"]
+        ]
@@ -0,0 +1,80 @@
+"""
+Intelligent Driver Model (Treiber et al.), vectorized over vehicles.
+Shared by the intersection and corridor simulators.
+"""
+import numpy as np
+
+DESIRED_SPEED = 13.9     # m/s (50 km/h)
+TIME_HEADWAY = 1.5       # s
+MAX_ACCEL = 1.5          # m/s^2
+COMFORT_DECEL = 2.0      # m/s^2
+MAX_DECEL = 9.0          # m/s^2, physical limit
+MIN_GAP = 2.0            # m, jam distance
+DELTA = 4
+VEHICLE_LENGTH = 5.0     # m
+
+def idm_acceleration(speed, gap, closing_speed, desired_speed=DESIRED_SPEED,
+                     headway=TIME_HEADWAY, accel=MAX_ACCEL, decel=COMFORT_DECEL,
+                     min_gap=MIN_GAP):
+    """
+    speed, gap (bumper to bumper, inf when free) and closing_speed
+    (own speed minus leader speed) are arrays of the same shape.
+    Returns accelerations clipped to [-MAX_DECEL, accel].
+    """
+    desired_gap = min_gap + np.maximum(
+        0.0, speed * headway + speed * closing_speed / (2.0 * np.sqrt(accel * decel))
+    )
+    free = (speed / desired_speed) ** DELTA
+    interaction = (desired_gap / np.maximum(gap, 0.01)) ** 2
+    return np.clip(accel * (1.0 - free - interaction), -MAX_DECEL, accel)
+
+def integrate(position, speed, acceleration, dt):
+    """
+    Ballistic update that never reverses: returns new (position, speed)
+    """
+    new_speed = np.maximum(speed + acceleration * dt, 0.0)
+    return position + (speed + new_speed) * 0.5 * dt, new_speed
+
+def stopping_distance(speed, decel=COMFORT_DECEL):
+    return speed * speed / (2.0 * decel)
+
+# =========================
+# LANE-ORDERED VEHICLE ARRAYS
+# =========================
+# Both simulators keep vehicles sorted by lane, then from the front of
+# the lane backwards, so each vehicle's leader is the previous entry.
+
+def leader_gaps(lane, position, speed, length=VEHICLE_LENGTH):
+    """
+    Bumper-to-bumper gap to the leader and closing speed per vehicle
+    (inf / 0 for the first vehicle of each lane). length is one value
+    or one per vehicle.
+    """
+    gap = np.full(len(position), np.inf)
+    closing = np.zeros(len(position))
+    same = lane[1:] == lane[:-1]
+    lead_length = length[:-1] if np.ndim(length) else length
+    gap[1:] = np.where(same, position[:-1] - lead_length - position[1:], np.inf)
+    closing[1:] = np.where(same, speed[1:] - speed[:-1], 0.0)
+    return gap, closing
+
+def entry_slots(lane, position, speed, waiting, length=VEHICLE_LENGTH):
+    """
+    For the lanes in `waiting`, whether a vehicle can enter at position 0
+    now (safe gap behind the lane's last vehicle), the index to insert it
+    at to keep the ordering, and its entry speed (the tail's speed)
+    """
+    ends = np.searchsorted(lane, waiting, side="right")
+    starts = np.searchsorted(lane, waiting, side="left")
+    has_tail = ends > starts
+    tail = np.where(has_tail, ends - 1, 0)
+    tail_pos = np.where(has_tail, position[tail] if len(position) else 0.0, np.inf)
+    tail_speed = np.where(has_tail, speed[tail] if len(speed) else 0.0, DESIRED_SPEED)
+    if np.ndim(length):
+        tail_length = length[tail] if len(length) else VEHICLE_LENGTH
+    else:
+        tail_length = length
+
+    entry_speed = np.minimum(tail_speed, DESIRED_SPEED)
+    room = tail_pos - tail_length >= MIN_GAP + entry_speed * TIME_HEADWAY
+    return room, ends, entry_speed
@@ -0,0 +1,473 @@
+"""
+Headless four-way intersection simulator.
+
+    python -m simulation.intersection --hours 2 --demand 600 --controller both
+
+Vehicles are kept as struct-of-arrays NumPy state (lane, position,
+speed, entry time), ordered by lane and then front to back, so every step
+is a handful of array operations however many vehicles are in the
+network. Car following is IDM, red and yellow signals act as a stationary
+obstacle at the stop line, and arrivals are Poisson per lane.
+
+A controller only needs update(dt, sim) and lane_state(approach) ->
+"G"/"Y"/"R", the interface of SignalController in the animation scripts.
+FixedTimeController is that controller; DecideSignalController lets
+Hemi's decide_signal() pick the green times, PlannerController runs
+signal_control.planner cycle plans and MaxPressureController its
+per-step max-pressure phase selection.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analytics.congestion import WEIGHTS
+from signal_control.optimizer import decide_signal
+from signal_control.planner import JunctionPlanner, PHASES, APPROACHES
+from simulation.idm import (
+    idm_acceleration, integrate, stopping_distance, leader_gaps, entry_slots,
+    DESIRED_SPEED, MAX_DECEL
+)
+
+DT = 0.5                  # s per step
+APPROACH_LENGTH = 300.0   # m from the entry point to the stop line
+EXIT_LENGTH = 30.0        # m past the stop line until the vehicle leaves
+LANES = 1                 # per approach
+
+# Vehicles per hour per approach
+DEMAND = 250
+
+# Simulated vehicle classes (names as in analytics.congestion.WEIGHTS),
+# their lengths (m) and the default traffic mix
+VEHICLE_CLASSES = ("motorcycle", "car", "bus", "truck")
+CLASS_LENGTHS = np.array([2.5, 5.0, 12.0, 10.0])
+MIX = {"car": 1.0}
+
+# Slower than this before the stop line counts as queued (m/s)
+QUEUE_SPEED = 2.0
+
+GREEN_TIME = 15
+YELLOW_TIME = 4
+
+# =========================
+# CONTROLLERS
+# =========================
+class FixedTimeController:
+    """
+    Fixed-time, one approach at a time (SignalController from
+    All Basic code/Animation 2.py). phase_groups optionally gives several
+    approaches green together, e.g. (("N", "S"), ("E", "W")).
+    """
+
+    def __init__(self, green_time=GREEN_TIME, yellow_time=YELLOW_TIME, approaches=APPROACHES,
+                 phase_groups=None):
+        self.approaches = approaches
+        self.phase_groups = phase_groups or tuple((a,) for a in approaches)
+        self.yellow_time = yellow_time
+        self.index = 0
+        self.state = "G"
+        self.timer = 0.0
+        self.green_time = green_time
+        self.phases = 0
+
+    def current_lane(self):
+        return "/".join(self.phase_groups[self.index])
+
+    def next_green(self, sim):
+        """
+        Green time for the approach whose phase is starting
+        """
+        return self.green_time
+
+    def update(self, dt, sim=None):
+        self.timer += dt
+
+        if self.state == "G" and self.timer >= self.green_time:
+            self.state = "Y"
+            self.timer = 0.0
+
+        elif self.state == "Y" and self.timer >= self.yellow_time:
+            self.index = (self.index + 1) % len(self.phase_groups)
+            self.state = "G"
+            self.timer = 0.0
+            self.phases += 1
+            self.green_time = self.next_green(sim)
+
+    def lane_state(self, lane):
+        if lane in self.phase_groups[self.index]:
+            return self.state
+        return "R"
+
+class DecideSignalController(FixedTimeController):
+    """
+    Same phase order, but each green time comes from decide_signal() fed
+    with the congestion score of the queue on the approach about to turn
+    green, as the camera pipeline would see it.
+    With use_arrivals, the approach's arrival rate is passed as well.
+
+    weights overrides entries of the WEIGHTS table and decide_params are
+    passed on to decide_signal() (gain, min_green, ...), for tuning.
+    """
+
+    def __init__(self, yellow_time=YELLOW_TIME, approaches=APPROACHES, use_arrivals=False,
+                 weights=None, decide_params=None):
+        super().__init__(GREEN_TIME, yellow_time, approaches)
+        self.use_arrivals = use_arrivals
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.decide_params = decide_params or {}
+        self.last_entered = None
+        self.last_time = 0.0
+        self.decisions = []
+
+    def next_green(self, sim):
+        if sim is None:
+            return self.green_time
+
+        approach = self.index
+        queued = int(sim.queue_lengths()[approach] + sim.backlog_lengths()[approach])
+        congestion = float(sim.queue_congestion(self.weights)[approach])
+
+        arrival_rate = None
+        if self.use_arrivals:
+            if self.last_entered is not None and sim.time > self.last_time:
+                arrivals = sim.entered - self.last_entered
+                arrival_rate = float(arrivals[approach]) * 60.0 / (sim.time - self.last_time)
+            self.last_entered = sim.entered.copy()
+            self.last_time = sim.time
+
+        decision = decide_signal(congestion, False, arrival_rate, **self.decide_params)
+        self.decisions.append((sim.time, self.approaches[approach], queued, decision["green_time"]))
+        return decision["green_time"]
+
+class PlannerController(FixedTimeController):
+    """
+    Runs signal_control.planner phase plans (NS / EW by default). At the
+    start of every cycle the plan is recomputed from the arrival rates
+    and queue scores measured on each approach during the last cycle.
+    """
+
+    def __init__(self, policy="webster", phases=PHASES, yellow_time=YELLOW_TIME,
+                 weights=None):
+        super().__init__(GREEN_TIME, yellow_time, APPROACHES, tuple(phases.values()))
+        self.planner = JunctionPlanner(1, policy, phases)
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.last_arrived = None
+        self.last_time = 0.0
+        self.plans = []
+
+    def _replan(self, sim):
+        arrived = sim.entered + sim.backlog_lengths()
+        if self.last_arrived is not None and sim.time > self.last_time:
+            rates = (arrived - self.last_arrived) * 60.0 / (sim.time - self.last_time)
+            self.planner.update(0, arrival_rates=rates[None],
+                                queues=sim.queue_congestion(self.weights)[None])
+            self.planner.replan()
+            self.plans.append((sim.time, self.planner.plan(0)))
+        self.last_arrived = arrived
+        self.last_time = sim.time
+
+    def next_green(self, sim):
+        if sim is None:
+            return self.green_time
+        if self.index == 0:
+            self._replan(sim)
+        return float(self.planner.green[0, self.index])
+
+class MaxPressureController(FixedTimeController):
+    """
+    Max-pressure control (no cycle): once the green phase has had its
+    minimum green, the planner is asked every step which phase has the
+    highest pressure from the current queue scores. The green is held
+    while that is the current phase; otherwise the signal goes yellow
+    and then green for the chosen phase.
+    """
+
+    def __init__(self, phases=PHASES, yellow_time=YELLOW_TIME, weights=None):
+        super().__init__(GREEN_TIME, yellow_time, APPROACHES, tuple(phases.values()))
+        self.planner = JunctionPlanner(1, "max-pressure", phases)
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.pending = self.index
+        self.switches = []
+
+    def update(self, dt, sim=None):
+        self.timer += dt
+
+        if self.state == "G":
+            if sim is None or self.timer < self.planner.min_green[0, self.index]:
+                return
+            self.planner.update(0, queues=sim.queue_congestion(self.weights)[None])
+            self.pending = self.planner.next_phase(0, self.index)
+            if self.pending != self.index:
+                self.switches.append((sim.time, self.timer))
+                self.state = "Y"
+                self.timer = 0.0
+
+        elif self.state == "Y" and self.timer >= self.yellow_time:
+            self.index = self.pending
+            self.state = "G"
+            self.timer = 0.0
+            self.phases += 1
+
+# =========================
+# SIMULATOR
+# =========================
+class IntersectionSim:
+    """
+    State columns (one entry per vehicle, sorted by lane, then from the
+    stop line backwards): lane, pos (m from entry, front bumper), speed
+    (m/s), entry_time (s), kind (index into VEHICLE_CLASSES).
+
+    mix: {class name: share} of arriving vehicles.
+    """
+
+    def __init__(self, controller, demand=DEMAND, lanes=LANES, dt=DT,
+                 approach_length=APPROACH_LENGTH, exit_length=EXIT_LENGTH, seed=0,
+                 mix=MIX):
+        self.controller = controller
+        self.approaches = controller.approaches
+        self.lanes = lanes
+        self.num_lanes = len(self.approaches) * lanes
+        self.dt = dt
+        self.stop_line = approach_length
+        self.end = approach_length + exit_length
+        self.rng = np.random.default_rng(seed)
+
+        # Vehicles per second arriving at each lane
+        demand = np.broadcast_to(np.asarray(demand, dtype=np.float64), (len(self.approaches),))
+        self.lane_rate = np.repeat(demand / 3600.0 / lanes, lanes)
+        self.lane_approach = np.repeat(np.arange(len(self.approaches)), lanes)
+
+        shares = np.array([mix.get(name, 0.0) for name in VEHICLE_CLASSES], dtype=np.float64)
+        self.mix = shares / shares.sum()
+
+        self.lane = np.empty(0, dtype=np.int32)
+        self.pos = np.empty(0, dtype=np.float64)
+        self.speed = np.empty(0, dtype=np.float64)
+        self.entered = np.zeros(len(self.approaches), dtype=np.int64)
+        self.entry_time = np.empty(0, dtype=np.float64)
+        self.kind = np.empty(0, dtype=np.int8)
+        self.length = np.empty(0, dtype=np.float64)
+
+        # Arrived but no room to enter yet (queue spilling past the entry)
+        self.backlog = np.zeros(self.num_lanes, dtype=np.int64)
+
+        self.time = 0.0
+        self.steps = 0
+        self.free_flow_time = self.end / DESIRED_SPEED
+
+        n = len(self.approaches)
+        self.exited = np.zeros(n, dtype=np.int64)
+        self.total_delay = np.zeros(n)
+        self.max_delay = np.zeros(n)
+        self.queue_time_sum = np.zeros(n)
+        self.max_queue = np.zeros(n, dtype=np.int64)
+        self.red_runs = 0
+
+    # -------------------------
+    # Observations
+    # -------------------------
+    def __len__(self):
+        return len(self.pos)
+
+    def queue_lengths(self):
+        """
+        Queued vehicles per approach (slow, before the stop line)
+        """
+        queued = (self.speed < QUEUE_SPEED) & (self.pos < self.stop_line)
+        return np.bincount(self.lane_approach[self.lane[queued]],
+                           minlength=len(self.approaches))
+
+    def queue_congestion(self, weights=WEIGHTS):
+        """
+        Congestion score (sum of class weights) of the queue per approach;
+        vehicles still waiting to enter count with the mix's mean weight
+        """
+        table = np.array([weights.get(name, 1) for name in VEHICLE_CLASSES], dtype=np.float64)
+        queued = (self.speed < QUEUE_SPEED) & (self.pos < self.stop_line)
+        score = np.bincount(self.lane_approach[self.lane[queued]],
+                            weights=table[self.kind[queued]], minlength=len(self.approaches))
+        return score + self.backlog_lengths() * float(table @ self.mix)
+
+    def backlog_lengths(self):
+        return np.bincount(self.lane_approach, weights=self.backlog,
+                           minlength=len(self.approaches)).astype(np.int64)
+
+    # -------------------------
+    # Step
+    # -------------------------
+    def _signal_states(self):
+        states = [self.controller.lane_state(a) for a in self.approaches]
+        red = np.array([s == "R" for s in states])
+        yellow = np.array([s == "Y" for s in states])
+        return red[self.lane_approach], yellow[self.lane_approach]
+
+    def step(self):
+        dt = self.dt
+        self.controller.update(dt, self)
+        red, yellow = self._signal_states()
+
+        if len(self.pos):
+            self._move(red[self.lane], yellow[self.lane])
+        self._remove_exited()
+        self._spawn()
+
+        self.time += dt
+        self.steps += 1
+
+        queue = self.queue_lengths() + self.backlog_lengths()
+        self.queue_time_sum += queue * dt
+        np.maximum(self.max_queue, queue, out=self.max_queue)
+
+    def _move(self, red, yellow):
+        pos, speed = self.pos, self.speed
+
+        gap, closing = leader_gaps(self.lane, pos, speed, self.length)
+
+        # Red/yellow: a standing obstacle at the stop line for vehicles
+        # that can still stop (comfortably on yellow, at all on red)
+        to_line = self.stop_line - pos
+        before = to_line > 0
+        stops = before & (
+            (red & (to_line >= stopping_distance(speed, MAX_DECEL)))
+            | (yellow & (to_line >= stopping_distance(speed)))
+        )
+        use_line = stops & (to_line < gap)
+        gap = np.where(use_line, to_line, gap)
+        closing = np.where(use_line, speed, closing)
+
+        accel = idm_acceleration(speed, gap, closing)
+        new_pos, self.speed = integrate(pos, speed, accel, self.dt)
+
+        crossed = before & (new_pos >= self.stop_line) & red
+        self.red_runs += int(np.count_nonzero(crossed))
+        self.pos = new_pos
+
+    def _remove_exited(self):
+        done = self.pos >= self.end
+        if not done.any():
+            return
+
+        approach = self.lane_approach[self.lane[done]]
+        delay = np.maximum(self.time + self.dt - self.entry_time[done] - self.free_flow_time, 0.0)
+        n = len(self.approaches)
+        self.exited += np.bincount(approach, minlength=n)
+        self.total_delay += np.bincount(approach, weights=delay, minlength=n)
+        np.maximum.at(self.max_delay, approach, delay)
+
+        keep = ~done
+        self.lane = self.lane[keep]
+        self.pos = self.pos[keep]
+        self.speed = self.speed[keep]
+        self.entry_time = self.entry_time[keep]
+        self.kind = self.kind[keep]
+        self.length = self.length[keep]
+
+    def _spawn(self):
+        self.backlog += self.rng.poisson(self.lane_rate * self.dt)
+        waiting = np.flatnonzero(self.backlog > 0)
+        if len(waiting) == 0:
+            return
+
+        room, ends, entry_speed = entry_slots(self.lane, self.pos, self.speed, waiting,
+                                              self.length)
+        if not room.any():
+            return
+
+        lanes = waiting[room]
+        if np.count_nonzero(self.mix) > 1:
+            kind = self.rng.choice(len(VEHICLE_CLASSES), size=len(lanes), p=self.mix)
+        else:
+            kind = np.full(len(lanes), np.argmax(self.mix))
+        self.backlog[lanes] -= 1
+        idx = ends[room]
+        self.lane = np.insert(self.lane, idx, lanes)
+        self.pos = np.insert(self.pos, idx, 0.0)
+        self.speed = np.insert(self.speed, idx, entry_speed[room])
+        self.entry_time = np.insert(self.entry_time, idx, self.time)
+        self.kind = np.insert(self.kind, idx, kind)
+        self.length = np.insert(self.length, idx, CLASS_LENGTHS[kind])
+        self.entered += np.bincount(self.lane_approach[lanes], minlength=len(self.approaches))
+
+    # -------------------------
+    # Runs
+    # -------------------------
+    def run(self, duration):
+        for _ in range(int(round(duration / self.dt))):
+            self.step()
+        return self.stats()
+
+    def stats(self):
+        exited = np.maximum(self.exited, 1)
+        per_approach = {
+            name: {
+                "entered": int(self.entered[i]),
+                "exited": int(self.exited[i]),
+                "mean_delay": round(float(self.total_delay[i] / exited[i]), 2),
+                "max_delay": round(float(self.max_delay[i]), 2),
+                "mean_queue": round(float(self.queue_time_sum[i] / max(self.time, self.dt)), 2),
+                "max_queue": int(self.max_queue[i]),
+            }
+            for i, name in enumerate(self.approaches)
+        }
+        return {
+            "sim_time": self.time,
+            "vehicles_in_network": len(self),
+            "backlog": int(self.backlog.sum()),
+            "throughput_per_hour": round(float(self.exited.sum()) * 3600 / max(self.time, self.dt), 1),
+            "mean_delay": round(float(self.total_delay.sum() / max(self.exited.sum(), 1)), 2),
+            "red_runs": self.red_runs,
+            "phases": self.controller.phases,
+            "approaches": per_approach,
+        }
+
+def make_controller(name):
+    if name == "fixed":
+        return FixedTimeController()
+    if name == "decide":
+        return DecideSignalController()
+    if name == "decide-arrivals":
+        return DecideSignalController(use_arrivals=True)
+    if name in ("webster", "pressure-split"):
+        return PlannerController(name)
+    if name == "max-pressure":
+        return MaxPressureController()
+    raise ValueError(f"unknown controller '{name}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless four-way intersection simulation")
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--demand", type=float, nargs="+", default=[DEMAND],
+                        help="vehicles/hour per approach (one value, or one per N S E W)")
+    parser.add_argument("--lanes", type=int, default=LANES)
+    parser.add_argument("--length", type=float, default=APPROACH_LENGTH, help="approach length (m)")
+    parser.add_argument("--controller", default="both",
+                        choices=("fixed", "decide", "decide-arrivals", "webster",
+                                 "pressure-split", "max-pressure", "both", "all"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    names = {
+        "both": ["fixed", "decide"],
+        "all": ["fixed", "decide", "webster", "pressure-split", "max-pressure"],
+    }.get(args.controller, [args.controller])
+    demand = args.demand[0] if len(args.demand) == 1 else args.demand
+
+    for name in names:
+        sim = IntersectionSim(make_controller(name), demand, args.lanes,
+                              approach_length=args.length, seed=args.seed)
+        start = time.perf_counter()
+        stats = sim.run(args.hours * 3600)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n=== {name.upper()} ===")
+        print(f"Simulated     : {args.hours:g} h in {elapsed:.2f} s "
+              f"({stats['sim_time'] / elapsed:.0f}x real time)")
+        print(f"Throughput    : {stats['throughput_per_hour']} veh/h")
+        print(f"Mean delay    : {stats['mean_delay']} s")
+        print(f"Backlog       : {stats['backlog']} vehicles waiting to enter")
+        for approach, s in stats["approaches"].items():
+            print(f"  {approach}: delay {s['mean_delay']:>7} s, "
+                  f"queue mean {s['mean_queue']:>6} max {s['max_queue']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from signal_control.optimizer import EMERGENCY_REASON
+from simulation.simulator import print_signal, DIRECTION
+
+YELLOW_TIME = 3
+
+class RealClock:
+    def now(self):
+        return time.monotonic()
+
+class VirtualClock:
+    """
+    Clock advanced explicitly, e.g. by 1/fps per recorded frame, so
+    footage and simulations can run faster than real time
+    """
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+class SignalScheduler:
+    """
+    Owns phase timing (GREEN -> YELLOW -> next decision) separately from
+    the detection loop. submit() never blocks: the newest decision waits
+    for the current phase to end, except emergencies, which preempt.
+
+    Phases advance either when update() is called (frame-driven, works
+    with VirtualClock) or on a background timer thread via start().
+    """
+
+    def __init__(self, clock=None, yellow_time=YELLOW_TIME, announce=True, on_green=None):
+        self.clock = clock or RealClock()
+        self.yellow_time = yellow_time
+        self.announce = announce
+        # Called with each decision when its green phase starts
+        self.on_green = on_green
+
+        self.cond = threading.Condition()
+        self.pending = None
+        self.decision = None
+        self.phase = "IDLE"
+        self.phase_end = None
+        self.cycles = 0
+
+        self._thread = None
+        self._running = False
+
+    # -------------------------
+    # Phase transitions
+    # -------------------------
+    def _start_green(self, decision, t):
+        self.pending = None
+        self.decision = decision
+        self.phase = "GREEN"
+        self.phase_end = t + decision["green_time"]
+        if self.announce:
+            print_signal(decision, decision.get("direction", DIRECTION))
+        if self.on_green is not None:
+            self.on_green(decision)
+
+    def _advance(self, now):
+        while self.phase_end is not None and now >= self.phase_end:
+            t = self.phase_end
+            if self.phase == "GREEN":
+                self.phase = "YELLOW"
+                self.phase_end = t + self.yellow_time
+            else:
+                self.cycles += 1
+                if self.pending is not None:
+                    self._start_green(self.pending, t)
+                else:
+                    self.phase = "IDLE"
+                    self.phase_end = None
+
+        if self.phase == "IDLE" and self.pending is not None:
+            self._start_green(self.pending, now)
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def submit(self, decision):
+        with self.cond:
+            now = self.clock.now()
+            self._advance(now)
+
+            preempt = (
+                decision["reason"] == EMERGENCY_REASON
+                and not (self.phase == "GREEN" and self.decision["reason"] == EMERGENCY_REASON)
+            )
+            if preempt:
+                self._start_green(decision, now)
+            else:
+                self.pending = decision
+                self._advance(now)
+
+            self.cond.notify()
+
+    def update(self, now=None):
+        with self.cond:
+            self._advance(self.clock.now() if now is None else now)
+            return self.state()
+
+    def state(self):
+        remaining = None
+        if self.phase_end is not None:
+            remaining = max(0.0, self.phase_end - self.clock.now())
+        return {
+            "phase": self.phase,
+            "remaining": remaining,
+            "decision": self.decision,
+            "cycles": self.cycles,
+        }
+
+    def start(self):
+        """
+        Real-time mode: advance phases on a timer thread that sleeps until
+        the next transition or the next submit()
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="signal-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self.cond:
+            self._running = False
+            self.cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _run(self):
+        with self.cond:
+            while self._running:
+                self._advance(self.clock.now())
+                timeout = None
+                if self.phase_end is not None:
+                    timeout = max(0.0, self.phase_end - self.clock.now())
+                self.cond.wait(timeout)
@@ -1,16 +1,19 @@
 import time
 
-def simulate_signal(signal_data):
-    direction = "MAIN_ROAD"
-    green_time = signal_data["green_time"]
+DIRECTION = "MAIN_ROAD"
 
+def print_signal(signal_data, direction=DIRECTION):
     print("\n==============================")
     print(f" SIGNAL: {signal_data['signal']}")
     print(f" DIRECTION: {direction}")
-    print(f" TIME: {green_time}s")
+    print(f" TIME: {signal_data['green_time']}s")
     print(f" REASON: {signal_data['reason']}")
     print("==============================")
 
+def simulate_signal(signal_data):
+    green_time = signal_data["green_time"]
+    print_signal(signal_data)
+
     for i in range(green_time, 0, -1):
         print(f" Green ends in {i}s", end="\r")
         time.sleep(1)
@@ -0,0 +1,283 @@
+"""
+Parallel Monte Carlo parameter sweeps over the intersection simulator.
+
+    python -m simulation.sweep sweep.json --workers 8 --output sweep_results.jsonl
+
+The spec (JSON) lists a grid and/or random-search ranges of parameters.
+Every configuration is run for `replications` seeds on a process pool;
+each finished replication is appended to the output file right away, so
+an interrupted sweep picks up where it stopped when run again with the
+same spec and output. The summary ranks configurations by the objective
+with 95% confidence intervals.
+
+Parameters:
+    gain, min_green, max_green, arrival_weight   decide_signal() constants
+    weight.<class>                               congestion WEIGHTS entries
+    green_time, yellow_time                      controller timing
+    demand, lanes                                scenario
+
+The controller is one of CONTROLLERS; green_time only applies to
+"fixed", the decide_signal() constants and weights only to the others.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from simulation.intersection import (
+    IntersectionSim, FixedTimeController, DecideSignalController, DEMAND, LANES, MIX
+)
+
+RESULTS_PATH = "sweep_results.jsonl"
+
+CONTROLLERS = ("fixed", "decide", "decide-arrivals")
+DECIDE_PARAMS = ("gain", "min_green", "max_green", "arrival_weight")
+METRICS = ("mean_delay", "throughput_per_hour", "mean_queue", "max_queue", "backlog")
+
+# Used when the spec doesn't say
+DEFAULTS = {
+    "controller": "decide",
+    "duration": 3600,
+    "replications": 10,
+    "samples": 20,
+    "seed": 0,
+    "objective": "mean_delay",
+    "scenario": {},
+    "grid": {},
+    "random": {},
+}
+
+# =========================
+# CONFIGURATIONS
+# =========================
+def expand(spec):
+    """
+    Grid points x random samples -> list of parameter dicts. Random
+    ranges [low, high] are uniform, integer when both bounds are ints.
+    """
+    grid = spec["grid"]
+    names = sorted(grid)
+    points = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+    ranges = spec["random"]
+    if not ranges:
+        return points
+
+    rng = np.random.default_rng(spec["seed"])
+    configs = []
+    for point in points:
+        for _ in range(spec["samples"]):
+            sample = dict(point)
+            for name in sorted(ranges):
+                low, high = ranges[name]
+                if isinstance(low, int) and isinstance(high, int):
+                    sample[name] = int(rng.integers(low, high + 1))
+                else:
+                    sample[name] = round(float(rng.uniform(low, high)), 4)
+            configs.append(sample)
+    return configs
+
+def config_key(spec, params):
+    """
+    Hash of everything a replication depends on besides its seed:
+    controller, scenario, duration and the swept parameters. Changing
+    any of them in the spec starts fresh instead of resuming.
+    """
+    config = {
+        "controller": spec["controller"],
+        "scenario": spec["scenario"],
+        "duration": spec["duration"],
+        "params": params,
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+def check_config(controller, params):
+    """
+    Raise ValueError for an unknown controller or a swept parameter the
+    controller would ignore
+    """
+    if controller not in CONTROLLERS:
+        raise ValueError(f"unknown controller '{controller}', expected one of {CONTROLLERS}")
+
+    if controller == "fixed":
+        unused = [k for k in params if k in DECIDE_PARAMS or k.startswith("weight.")]
+    else:
+        unused = [k for k in params if k == "green_time"]
+    if unused:
+        raise ValueError(f"{', '.join(sorted(unused))} not used by the '{controller}' controller")
+
+# =========================
+# ONE REPLICATION (worker process)
+# =========================
+def build_sim(controller, scenario, params, seed):
+    check_config(controller, params)
+    decide_params = {k: params[k] for k in DECIDE_PARAMS if k in params}
+    weights = {k.split(".", 1)[1]: v for k, v in params.items() if k.startswith("weight.")}
+    timing = {k: params[k] for k in ("green_time", "yellow_time") if k in params}
+
+    if controller == "fixed":
+        ctrl = FixedTimeController(**timing)
+    else:
+        ctrl = DecideSignalController(
+            yellow_time=timing.get("yellow_time", FixedTimeController().yellow_time),
+            use_arrivals=controller == "decide-arrivals",
+            weights=weights,
+            decide_params=decide_params,
+        )
+
+    return IntersectionSim(
+        ctrl,
+        demand=params.get("demand", scenario.get("demand", DEMAND)),
+        lanes=params.get("lanes", scenario.get("lanes", LANES)),
+        mix=scenario.get("mix", MIX),
+        seed=seed,
+    )
+
+def run_replication(controller, scenario, duration, params, seed):
+    sim = build_sim(controller, scenario, params, seed)
+    stats = sim.run(duration)
+    approaches = stats["approaches"].values()
+    return {
+        "mean_delay": stats["mean_delay"],
+        "throughput_per_hour": stats["throughput_per_hour"],
+        "mean_queue": round(sum(a["mean_queue"] for a in approaches), 2),
+        "max_queue": max(a["max_queue"] for a in approaches),
+        "backlog": stats["backlog"],
+    }
+
+# =========================
+# RESULTS
+# =========================
+def load_results(path):
+    """
+    Replications already in the output file, skipping a torn last line
+    """
+    results = []
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+    return results
+
+def t_critical(df):
+    """
+    Two-sided 95% Student t value
+    """
+    try:
+        from scipy.stats import t
+        return float(t.ppf(0.975, df))
+    except ImportError:
+        table = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+                 8: 2.306, 9: 2.262, 10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042}
+        for limit in sorted(table):
+            if df <= limit:
+                return table[limit]
+        return 1.96
+
+def aggregate(results, objective="mean_delay"):
+    """
+    Per configuration: mean, std and 95% CI half-width of every metric,
+    sorted by the objective's mean (lowest first, throughput highest first)
+    """
+    groups = {}
+    for r in results:
+        groups.setdefault(r["key"], {"params": r["params"], "runs": []})["runs"].append(r["metrics"])
+
+    summary = []
+    for key, group in groups.items():
+        n = len(group["runs"])
+        entry = {"key": key, "params": group["params"], "replications": n}
+        for metric in METRICS:
+            values = np.array([run[metric] for run in group["runs"]], dtype=np.float64)
+            std = float(values.std(ddof=1)) if n > 1 else 0.0
+            half = t_critical(n - 1) * std / np.sqrt(n) if n > 1 else float("nan")
+            entry[metric] = {"mean": round(float(values.mean()), 3),
+                             "std": round(std, 3), "ci95": round(float(half), 3)}
+        summary.append(entry)
+
+    descending = objective == "throughput_per_hour"
+    summary.sort(key=lambda e: e[objective]["mean"], reverse=descending)
+    return summary
+
+# =========================
+# SWEEP
+# =========================
+def run_sweep(spec, output=RESULTS_PATH, workers=None):
+    spec = {**DEFAULTS, **spec}
+    configs = expand(spec)
+    for params in configs:
+        check_config(spec["controller"], params)
+    seeds = [spec["seed"] + r for r in range(spec["replications"])]
+
+    done = {(r["key"], r["seed"]) for r in load_results(output)}
+    keyed = [(config_key(spec, p), p) for p in configs]
+    jobs = [(key, p, seed) for key, p in keyed for seed in seeds if (key, seed) not in done]
+
+    print(f"[SWEEP] {len(configs)} configurations x {len(seeds)} replications, "
+          f"{len(keyed) * len(seeds) - len(jobs)} already done, {len(jobs)} to run")
+
+    if jobs:
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool, \
+                open(output, "a") as out:
+            futures = {
+                pool.submit(run_replication, spec["controller"], spec["scenario"],
+                            spec["duration"], params, seed): (key, params, seed)
+                for key, params, seed in jobs
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                key, params, seed = futures[future]
+                record = {"key": key, "params": params, "seed": seed, "metrics": future.result()}
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+                if i % 10 == 0 or i == len(jobs):
+                    elapsed = time.perf_counter() - start
+                    print(f"[SWEEP] {i}/{len(jobs)} replications ({elapsed:.0f} s)")
+
+    keys = {key for key, _ in keyed}
+    results = [r for r in load_results(output) if r["key"] in keys]
+    return aggregate(results, spec["objective"])
+
+def print_summary(summary, objective, top=10):
+    print(f"\n=== TOP {min(top, len(summary))} BY {objective.upper()} ===")
+    for entry in summary[:top]:
+        stats = "  ".join(
+            f"{m} {entry[m]['mean']:.2f}±{entry[m]['ci95']:.2f}"
+            for m in ("mean_delay", "throughput_per_hour", "mean_queue")
+        )
+        print(f"{json.dumps(entry['params'], sort_keys=True)}  (n={entry['replications']})")
+        print(f"    {stats}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo signal-policy sweep")
+    parser.add_argument("spec", help="sweep spec (JSON)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="replication results (JSONL, resumable)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--summary", help="also write the aggregated summary here (JSON)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+
+    summary = run_sweep(spec, args.output, args.workers)
+    print_summary(summary, spec.get("objective", DEFAULTS["objective"]), args.top)
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
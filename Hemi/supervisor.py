@@ -0,0 +1,284 @@
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+
+# Camera list: [{"id": "junction1_north", "source": "assets/north.mp4"}, ...]
+CAMERAS_PATH = "cameras.json"
+
+# Per-frame results are appended here as JSON lines (None to disable)
+SINK_PATH = "stream_results.jsonl"
+
+NUM_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+MAX_RESTARTS = 5
+RESTART_BACKOFF = 2.0
+
+# Live sources that drop out are reopened after this many seconds
+REOPEN_DELAY = 1.0
+
+def load_cameras(path=CAMERAS_PATH):
+    with open(path) as f:
+        cameras = json.load(f)
+    return [c for c in cameras if c.get("enabled", True)]
+
+def assign_streams(cameras, num_workers):
+    """
+    Round-robin split of cameras over workers
+    """
+    groups = [[] for _ in range(min(num_workers, len(cameras)))]
+    for i, camera in enumerate(cameras):
+        groups[i % len(groups)].append(camera)
+    return groups
+
+# =========================
+# WORKER
+# =========================
+def _open(camera, start_frame=0):
+    """
+    Open a camera's source; recorded files resume at start_frame.
+    Raises OSError when the source cannot be opened.
+    """
+    import cv2
+    cap = cv2.VideoCapture(camera["source"])
+    if not cap.isOpened():
+        cap.release()
+        raise OSError(f"cannot open {camera['source']}")
+    if start_frame and not camera.get("live", False):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    return cap
+
+def worker_main(worker_id, cameras, sink, threads, resume=None):
+    """
+    Serves several streams from one model instance. One frame is read from
+    each open stream per round and the whole round goes through the model
+    in a single call.
+
+    A stream that drops out (live), raises or does not open is closed and
+    reopened after REOPEN_DELAY without holding up the others; files
+    reopen at the next unprocessed frame. Errors and failed opens count
+    toward MAX_RESTARTS. resume maps camera id -> first frame index, so a
+    restarted worker continues where the previous one was acknowledged.
+    """
+    # Split the cores between workers before torch/OpenCV start their pools
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+    import cv2
+    cv2.setNumThreads(1)
+
+    from vision.detector import infer, extract_batch, TARGET_WIDTH, TARGET_HEIGHT, WEIGHTS, DEVICE
+    from vision.model_registry import get_model, warm_up
+    from pipeline.stages import queue_congestion, frame_emergency
+    from vision.zone_mapper import load_zone_map
+    from signal_control.optimizer import decide_signal
+
+    # Load once per worker and pay graph initialization before the first frame
+    warm_up(get_model(WEIGHTS, DEVICE), batch_size=len(cameras))
+
+    resume = resume or {}
+    frame_index = {c["id"]: resume.get(c["id"], 0) for c in cameras}
+    captures = {}
+    live = {c["id"]: c.get("live", False) for c in cameras}
+    sources = {c["id"]: c for c in cameras}
+    zone_maps = {c["id"]: load_zone_map(c["id"]) for c in cameras}
+
+    # Closed streams waiting to be reopened: camera id -> monotonic time
+    next_retry = {}
+    errors = {}
+
+    def close(cam_id, error=None):
+        cap = captures.pop(cam_id, None)
+        if cap is not None:
+            cap.release()
+        if error is not None:
+            errors[cam_id] = errors.get(cam_id, 0) + 1
+            if errors[cam_id] > MAX_RESTARTS:
+                print(f"[WORKER {worker_id}] stream {cam_id} gave up: {error!r}")
+                sink.put({"type": "done", "camera": cam_id, "worker": worker_id,
+                          "error": repr(error)})
+                return
+            print(f"[WORKER {worker_id}] stream {cam_id} failed ({error!r}), reopening")
+        next_retry[cam_id] = time.monotonic() + REOPEN_DELAY
+
+    def reopen(cam_id):
+        # A source that does not open counts as a failure of its stream
+        try:
+            captures[cam_id] = _open(sources[cam_id], frame_index[cam_id])
+        except OSError as e:
+            close(cam_id, e)
+
+    for cam_id in sources:
+        reopen(cam_id)
+
+    while captures or next_retry:
+        now = time.monotonic()
+        for cam_id, due in list(next_retry.items()):
+            if now >= due:
+                del next_retry[cam_id]
+                reopen(cam_id)
+
+        ids, frames = [], []
+
+        for cam_id, cap in list(captures.items()):
+            try:
+                ret, frame = cap.read()
+                if not ret:
+                    if live[cam_id]:
+                        close(cam_id)
+                        continue
+                    captures.pop(cam_id).release()
+                    sink.put({"type": "done", "camera": cam_id, "worker": worker_id})
+                    continue
+
+                frame = cv2.resize(frame, (TARGET_WIDTH, TARGET_HEIGHT))
+            except Exception as e:
+                close(cam_id, e)
+                continue
+
+            ids.append(cam_id)
+            frames.append(frame)
+
+        if not frames:
+            if next_retry:
+                time.sleep(max(0.0, min(next_retry.values()) - time.monotonic()))
+            continue
+
+        results = infer(frames)
+
+        for cam_id, frame, result in zip(ids, frames, results):
+            try:
+                detections = extract_batch(result, frame.shape[0])
+                congestion = queue_congestion(detections, zone_maps[cam_id])
+                emergency = frame_emergency(detections)
+                signal = decide_signal(congestion, emergency)
+            except Exception as e:
+                # Skip the frame that failed, not the stream
+                frame_index[cam_id] += 1
+                if cam_id in captures:
+                    close(cam_id, e)
+                continue
+
+            sink.put({
+                "type": "frame",
+                "camera": cam_id,
+                "worker": worker_id,
+                "frame": frame_index[cam_id],
+                "time": time.time(),
+                "congestion": congestion,
+                "emergency": emergency,
+                "signal": signal,
+            })
+            frame_index[cam_id] += 1
+            errors.pop(cam_id, None)
+
+# =========================
+# SUPERVISOR
+# =========================
+class Supervisor:
+    """
+    Spreads camera streams over a pool of worker processes, collects their
+    results from one shared queue and restarts workers that die, without
+    touching the streams served by the other workers.
+    """
+
+    def __init__(self, cameras, num_workers=NUM_WORKERS, sink_path=SINK_PATH):
+        self.ctx = mp.get_context("spawn")
+        self.sink = self.ctx.Queue(maxsize=10000)
+        self.groups = assign_streams(cameras, num_workers)
+        self.threads = max(1, (os.cpu_count() or 1) // max(1, len(self.groups)))
+        self.sink_path = sink_path
+
+        self.workers = {}
+        self.restarts = {}
+        self.finished = set()
+        self.latest = {}
+        self.out = None
+
+    def _start(self, worker_id):
+        cameras = [c for c in self.groups[worker_id] if c["id"] not in self.finished]
+        if not cameras:
+            return
+        # Continue after the last frame each stream delivered
+        resume = {c["id"]: self.latest[c["id"]]["frame"] + 1
+                  for c in cameras if c["id"] in self.latest}
+        p = self.ctx.Process(
+            target=worker_main,
+            args=(worker_id, cameras, self.sink, self.threads, resume),
+            name=f"stream-worker-{worker_id}",
+            daemon=True,
+        )
+        p.start()
+        self.workers[worker_id] = p
+
+    def _check_workers(self):
+        for worker_id, p in list(self.workers.items()):
+            if p.is_alive():
+                continue
+
+            del self.workers[worker_id]
+            if p.exitcode == 0:
+                # Clean exit: every stream it served has ended
+                continue
+
+            pending = [c for c in self.groups[worker_id] if c["id"] not in self.finished]
+            if not pending:
+                continue
+
+            self.restarts[worker_id] = self.restarts.get(worker_id, 0) + 1
+            if self.restarts[worker_id] > MAX_RESTARTS:
+                print(f"[SUPERVISOR] worker {worker_id} gave up after {MAX_RESTARTS} restarts")
+                continue
+
+            print(f"[SUPERVISOR] worker {worker_id} exited ({p.exitcode}), restarting")
+            time.sleep(RESTART_BACKOFF)
+            # Take in everything the dead worker delivered before resuming
+            self._drain()
+            self._start(worker_id)
+
+    def handle(self, message):
+        if message["type"] == "done":
+            self.finished.add(message["camera"])
+            if "error" in message:
+                print(f"[SUPERVISOR] stream {message['camera']} failed: {message['error']}")
+            else:
+                print(f"[SUPERVISOR] stream {message['camera']} finished")
+            return
+
+        self.latest[message["camera"]] = message
+        if self.out is not None:
+            self.out.write(json.dumps(message) + "\n")
+
+    def _drain(self):
+        while True:
+            try:
+                self.handle(self.sink.get_nowait())
+            except queue.Empty:
+                break
+
+    def run(self):
+        for worker_id in range(len(self.groups)):
+            self._start(worker_id)
+
+        self.out = open(self.sink_path, "a") if self.sink_path else None
+        last_check = time.monotonic()
+        try:
+            while self.workers:
+                try:
+                    self.handle(self.sink.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+
+                if time.monotonic() - last_check >= 1.0:
+                    self._check_workers()
+                    last_check = time.monotonic()
+
+            # Drain whatever the last workers left behind
+            self._drain()
+        finally:
+            for p in self.workers.values():
+                p.terminate()
+            if self.out is not None:
+                self.out.close()
+
+if __name__ == "__main__":
+    Supervisor(load_cameras()).run()
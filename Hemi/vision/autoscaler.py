@@ -0,0 +1,172 @@
+"""
+Latency-SLO autoscaler: keeps per-frame inference latency inside a budget
+by stepping between model variants and input sizes at runtime.
+"""
+import collections
+import json
+import time
+
+import numpy as np
+
+from vision.detector import configure_model, DEVICE
+from vision.model_registry import get_model, warm_up
+
+# Accuracy ladder, most accurate first: (weights, imgsz). Each step down
+# is cheaper than the one before it.
+LEVELS = (
+    ("yolo26x.pt", 640),
+    ("yolo26m.pt", 640),
+    ("yolo26s.pt", 640),
+    ("yolo26s.pt", 480),
+    ("yolo26s.pt", 320),
+)
+
+LATENCY_BUDGET_MS = 100
+
+# Per-frame latencies (after a switch) needed before acting
+WINDOW = 30
+
+# The window's p95 is compared against the budget
+PERCENTILE = 95
+
+# Hysteresis: step down above the budget, step up only while the p95
+# leaves this much headroom, for UPSCALE_PATIENCE full windows in a row
+UPSCALE_HEADROOM = 0.6
+UPSCALE_PATIENCE = 3
+
+# Load and warm up every level's model (at every input size) when the
+# autoscaler is created, so a switch never loads a model mid-stream
+PRELOAD = True
+WARMUP_RUNS = 2
+
+# Frames ignored after a switch (caches and allocator settling)
+SETTLE_FRAMES = 3
+
+# Each time an upscale has to be undone, upscaling to that level needs
+# twice as many windows, so an unstable level is not retried every few seconds
+BACKOFF_LIMIT = 32
+
+# Switch log (JSON lines) for matching accuracy and throughput afterwards
+SWITCH_LOG = "autoscaler.jsonl"
+
+class LatencyAutoscaler:
+    """
+    Watches per-frame inference latency and switches the detector between
+    LEVELS. observe() is called after every model call; when it decides to
+    switch it reconfigures the detector and returns the new level.
+    """
+
+    def __init__(self, budget_ms=LATENCY_BUDGET_MS, levels=LEVELS, start_level=0,
+                 window=WINDOW, device=DEVICE, log_path=SWITCH_LOG,
+                 preload=PRELOAD, batch_size=1):
+        self.budget = budget_ms / 1000.0
+        self.levels = levels
+        self.window = window
+        self.device = device
+        self.log_path = log_path
+
+        self.level = start_level
+        self.samples = collections.deque(maxlen=window)
+        self.settle = 0
+        self.calm_windows = 0
+        # level -> extra upscale patience multiplier
+        self.backoff = collections.defaultdict(lambda: 1)
+        self.last_upscale = None
+
+        self.frames = 0
+        self.switches = []
+
+        if preload:
+            self.preload(batch_size)
+        self._apply(start_level)
+
+    def preload(self, batch_size=1):
+        """
+        Load every level's model through the registry and run warm-up
+        inferences at its input size. Returns seconds spent per level.
+        """
+        times = []
+        for weights, imgsz in self.levels:
+            start = time.perf_counter()
+            warm_up(get_model(weights, self.device), WARMUP_RUNS,
+                    batch_size=batch_size, imgsz=imgsz)
+            times.append(time.perf_counter() - start)
+            print(f"[AUTOSCALE] warmed up {weights}@{imgsz} in {times[-1]:.2f} s")
+        return times
+
+    def _apply(self, level):
+        weights, imgsz = self.levels[level]
+        configure_model(weights, self.device, imgsz)
+        self.samples.clear()
+        self.settle = SETTLE_FRAMES
+        self.calm_windows = 0
+
+    def current(self):
+        weights, imgsz = self.levels[self.level]
+        return {"level": self.level, "weights": weights, "imgsz": imgsz}
+
+    def observe(self, seconds, frames=1):
+        """
+        Record one model call that took `seconds` for `frames` frames.
+        Returns the new level when a switch happened, else None.
+        """
+        self.frames += frames
+        if self.settle > 0:
+            self.settle -= 1
+            return None
+
+        per_frame = seconds / frames
+        for _ in range(frames):
+            self.samples.append(per_frame)
+        if len(self.samples) < self.window:
+            return None
+
+        p = float(np.percentile(self.samples, PERCENTILE))
+
+        if p > self.budget and self.level < len(self.levels) - 1:
+            # The upscale that got us here didn't hold: retry it less often
+            if self.last_upscale == self.level:
+                self.backoff[self.level] = min(self.backoff[self.level] * 2, BACKOFF_LIMIT)
+            self.last_upscale = None
+            return self._switch(self.level + 1, p, "over budget")
+
+        if p < self.budget * UPSCALE_HEADROOM and self.level > 0:
+            self.calm_windows += 1
+            self.samples.clear()
+            if self.calm_windows >= UPSCALE_PATIENCE * self.backoff[self.level - 1]:
+                self.last_upscale = self.level - 1
+                return self._switch(self.level - 1, p, "headroom")
+            return None
+
+        self.calm_windows = 0
+        if self.last_upscale == self.level:
+            # Held a full window within budget: forgive earlier failures
+            self.backoff[self.level] = max(1, self.backoff[self.level] // 2)
+            self.last_upscale = None
+        return None
+
+    def _switch(self, level, p, reason):
+        old_weights, old_imgsz = self.levels[self.level]
+        new_weights, new_imgsz = self.levels[level]
+
+        entry = {
+            "time": time.time(),
+            "frame": self.frames,
+            "from": {"weights": old_weights, "imgsz": old_imgsz},
+            "to": {"weights": new_weights, "imgsz": new_imgsz},
+            "p95_ms": round(p * 1000, 1),
+            "budget_ms": round(self.budget * 1000, 1),
+            "reason": reason,
+        }
+        self.switches.append(entry)
+        print(f"[AUTOSCALE] frame {self.frames}: {old_weights}@{old_imgsz} -> "
+              f"{new_weights}@{new_imgsz} (p95 {entry['p95_ms']} ms, "
+              f"budget {entry['budget_ms']} ms, {reason})")
+
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        self.level = level
+        self._apply(level)
+        return level
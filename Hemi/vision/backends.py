@@ -0,0 +1,279 @@
+"""
+CPU inference backends for the detector.
+
+    python -m vision.backends --video assets/traffic_video.mp4 --backends onnx openvino --int8
+
+Exports the configured weights to ONNX and/or OpenVINO IR (optionally INT8
+post-training quantized with frames sampled from our own footage) and
+compares latency, throughput and mAP drift against the PyTorch baseline.
+Exported models load through the same registry and return the same
+ultralytics Results, so detection output is unchanged.
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from vision.detector import (
+    infer, configure_model, read_frames, extract_batch, WEIGHTS, DEVICE
+)
+from vision.model_registry import get_model, warm_up
+from vision.tracker import iou_matrix
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Network input size (h, w). PyTorch at the default imgsz=640 letterboxes
+# our 854x480 frames to 640x384, so exports use the same shape.
+EXPORT_IMGSZ = (384, 640)
+
+CALIBRATION_DIR = "calibration"
+CALIBRATION_FRAMES = 300
+
+# =========================
+# CALIBRATION SET
+# =========================
+def build_calibration_set(video_paths, out_dir=CALIBRATION_DIR, count=CALIBRATION_FRAMES):
+    """
+    Sample `count` frames evenly across the videos into an image folder
+    plus a dataset yaml (as expected by ultralytics INT8 export)
+    """
+    image_dir = os.path.join(out_dir, "images", "val")
+    os.makedirs(image_dir, exist_ok=True)
+
+    per_video = max(1, count // len(video_paths))
+    written = 0
+
+    for v, path in enumerate(video_paths):
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        wanted = set(np.linspace(0, total - 1, per_video).astype(int).tolist())
+
+        for i, frame in enumerate(read_frames(cap)):
+            if i in wanted:
+                cv2.imwrite(os.path.join(image_dir, f"v{v}_{i:06d}.jpg"), frame)
+                written += 1
+        cap.release()
+
+    names = get_model(WEIGHTS, DEVICE).names
+    yaml_path = os.path.join(out_dir, "data.yaml")
+    with open(yaml_path, "w") as f:
+        f.write(f"path: {os.path.abspath(out_dir)}\n")
+        f.write("train: images/val\nval: images/val\n")
+        f.write("names:\n")
+        for i in range(len(names)):
+            f.write(f"  {i}: {names[i]}\n")
+
+    print(f"[INFO] {written} calibration frames in {image_dir}")
+    return yaml_path
+
+def letterbox(frame, imgsz=EXPORT_IMGSZ):
+    """
+    Same preprocessing as ultralytics: keep aspect, pad with 114,
+    BGR -> RGB, CHW float32 in [0, 1], batch dimension
+    """
+    h, w = frame.shape[:2]
+    scale = min(imgsz[0] / h, imgsz[1] / w)
+    nh, nw = round(h * scale), round(w * scale)
+    resized = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((imgsz[0], imgsz[1], 3), 114, dtype=np.uint8)
+    top = (imgsz[0] - nh) // 2
+    left = (imgsz[1] - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+
+    return canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+
+# =========================
+# EXPORT
+# =========================
+def _quantize_onnx(fp32_path, calibration_dir, imgsz):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    )
+
+    input_name = InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    image_dir = os.path.join(calibration_dir, "images", "val")
+    images = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir))
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(images)
+
+        def get_next(self):
+            path = next(self.images, None)
+            if path is None:
+                return None
+            return {input_name: letterbox(cv2.imread(path), imgsz)}
+
+    int8_path = fp32_path.replace(".onnx", "_int8.onnx")
+    quantize_static(
+        fp32_path, int8_path, FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return int8_path
+
+def export_backend(backend, weights=WEIGHTS, int8=False, calibration=None, imgsz=EXPORT_IMGSZ):
+    """
+    Export weights for a backend and return the path to load with
+    get_model()/configure_model(). calibration is a data.yaml from
+    build_calibration_set(), required for int8.
+    """
+    if backend == "torch":
+        return weights
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend '{backend}', expected one of {BACKENDS}")
+    if int8 and calibration is None:
+        raise ValueError("int8 export needs a calibration set (build_calibration_set)")
+
+    from ultralytics import YOLO
+    model = YOLO(weights)
+
+    if backend == "onnx":
+        path = model.export(format="onnx", imgsz=list(imgsz), dynamic=True, simplify=True)
+        if int8:
+            path = _quantize_onnx(path, os.path.dirname(calibration), imgsz)
+        return path
+
+    # OpenVINO: ultralytics runs NNCF post-training quantization on `data`
+    return model.export(format="openvino", imgsz=list(imgsz), dynamic=True,
+                        int8=int8, data=calibration)
+
+# =========================
+# COMPARISON
+# =========================
+def average_precision(predictions, references, iou_threshold=0.5):
+    """
+    mAP@iou_threshold of predicted DetectionBatches against reference
+    batches (the PyTorch baseline acts as ground truth)
+    """
+    classes = set()
+    for ref in references:
+        classes.update(ref.class_ids.tolist())
+
+    aps = []
+    for cls in sorted(classes):
+        scores, hits = [], []
+        total_refs = 0
+
+        for pred, ref in zip(predictions, references):
+            ref_boxes = ref.boxes[ref.class_ids == cls]
+            total_refs += len(ref_boxes)
+
+            mask = pred.class_ids == cls
+            boxes = pred.boxes[mask]
+            conf = pred.confidences[mask]
+            order = np.argsort(-conf)
+
+            iou = iou_matrix(boxes[order], ref_boxes)
+            used = np.zeros(len(ref_boxes), dtype=bool)
+            for k in range(len(order)):
+                hit = False
+                if len(ref_boxes):
+                    candidates = np.where(used, -1.0, iou[k])
+                    j = int(np.argmax(candidates))
+                    if candidates[j] >= iou_threshold:
+                        used[j] = True
+                        hit = True
+                scores.append(conf[order[k]])
+                hits.append(hit)
+
+        if total_refs == 0:
+            continue
+
+        order = np.argsort(-np.array(scores))
+        tp = np.array(hits, dtype=np.float64)[order]
+        tp_cum = np.cumsum(tp)
+        recall = tp_cum / total_refs
+        precision = tp_cum / np.arange(1, len(tp) + 1)
+
+        # All-point interpolation
+        r = np.concatenate([[0.0], recall, [1.0]])
+        p = np.concatenate([[1.0], precision, [0.0]])
+        p = np.maximum.accumulate(p[::-1])[::-1]
+        aps.append(float(np.sum((r[1:] - r[:-1]) * p[1:])))
+
+    return float(np.mean(aps)) if aps else 1.0
+
+def _run(weights, frames):
+    configure_model(weights, DEVICE)
+    warm_up(get_model(weights, DEVICE), runs=2, height=frames[0].shape[0], width=frames[0].shape[1])
+
+    latencies, batches = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        results = infer(frame)
+        latencies.append(time.perf_counter() - start)
+        batches.append(extract_batch(results[0], frame.shape[0]))
+
+    return np.array(latencies) * 1000, batches
+
+def compare_backends(video_path, candidates, max_frames=200):
+    """
+    candidates: {label: weights path}. Runs the PyTorch baseline and
+    every candidate over the same frames.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    for frame in read_frames(cap):
+        frames.append(frame)
+        if len(frames) >= max_frames:
+            break
+    cap.release()
+
+    baseline_weights = WEIGHTS
+    report = {}
+    baseline_ms, baseline = _run(baseline_weights, frames)
+
+    for label, weights in [("torch", baseline_weights)] + list(candidates.items()):
+        if label == "torch":
+            ms, batches = baseline_ms, baseline
+        else:
+            ms, batches = _run(weights, frames)
+
+        report[label] = {
+            "weights": str(weights),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "fps": round(1000.0 / float(ms.mean()), 1),
+            "map50_vs_torch": round(average_precision(batches, baseline), 4),
+            "detections": int(sum(len(b) for b in batches)),
+        }
+
+    configure_model(baseline_weights, DEVICE)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and compare CPU inference backends")
+    parser.add_argument("--video", required=True, help="footage for calibration and comparison")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"], choices=BACKENDS[1:])
+    parser.add_argument("--int8", action="store_true", help="also build INT8 variants")
+    parser.add_argument("--calibration-frames", type=int, default=CALIBRATION_FRAMES)
+    parser.add_argument("--frames", type=int, default=200, help="frames used for the comparison")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    calibration = None
+    if args.int8:
+        calibration = build_calibration_set([args.video], count=args.calibration_frames)
+
+    candidates = {}
+    for backend in args.backends:
+        candidates[backend] = export_backend(backend)
+        if args.int8:
+            candidates[f"{backend}-int8"] = export_backend(backend, int8=True, calibration=calibration)
+
+    report = compare_backends(args.video, candidates, args.frames)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
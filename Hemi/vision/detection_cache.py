@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from vision.detections import DetectionBatch
+
+# Each cached run is one directory, <cache dir>/<key>/ (see
+# vision.detector.cache_entry), holding chunk_NNNNN.npz files and meta.json
+
+# Frames per .npz chunk
+CHUNK_FRAMES = 2000
+
+# Bytes hashed from each sampled region of the video
+HASH_BLOCK = 1 << 20
+HASH_SAMPLES = 16
+
+def video_hash(path):
+    """
+    Content hash of a video file from its size and HASH_SAMPLES blocks
+    spread over the file, so hours of footage hash in milliseconds
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+
+    with open(path, "rb") as f:
+        step = max(1, (size - HASH_BLOCK) // max(1, HASH_SAMPLES - 1))
+        for i in range(HASH_SAMPLES):
+            f.seek(min(i * step, max(0, size - HASH_BLOCK)))
+            digest.update(f.read(HASH_BLOCK))
+    return digest.hexdigest()
+
+def weights_id(weights):
+    """
+    Weights name plus size and mtime when it is a local file (or an
+    exported model directory), so retrained weights get a new key
+    """
+    if os.path.exists(weights):
+        stat = os.stat(weights)
+        return f"{os.path.abspath(weights)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return weights
+
+def cache_key(video_path, weights, conf, imgsz, resolution, classes, roi=None):
+    """
+    Everything that changes the detections of a run, hashed. roi is the
+    (band, crop) rows from roi_rows() when ROI inference is on.
+    """
+    fields = {
+        "video": video_hash(video_path),
+        "weights": weights_id(weights),
+        "conf": conf,
+        "imgsz": imgsz,
+        "resolution": list(resolution),
+        "classes": list(classes),
+        "roi": roi,
+    }
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:16], fields
+
+def _meta_path(directory):
+    return os.path.join(directory, "meta.json")
+
+def is_complete(directory):
+    """
+    True when a run finished writing this cache entry
+    """
+    try:
+        with open(_meta_path(directory)) as f:
+            return json.load(f).get("complete", False)
+    except (FileNotFoundError, ValueError):
+        return False
+
+class DetectionCacheWriter:
+    """
+    Appends per-frame DetectionBatches and writes them as .npz chunks of
+    concatenated columns plus a per-frame count. meta.json is written
+    last and marks the entry complete only after close(complete=True),
+    so an interrupted run is never replayed.
+    """
+
+    def __init__(self, directory, fields, chunk_frames=CHUNK_FRAMES):
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+
+        self.directory = directory
+        self.fields = fields
+        self.chunk_frames = chunk_frames
+        self.frames = 0
+        self.chunks = 0
+        self.names = None
+        self.frame_height = None
+        self._pending = []
+
+    def add(self, batch):
+        if self.names is None:
+            self.names = batch.names
+            self.frame_height = batch.frame_height
+        self._pending.append(batch)
+        self.frames += 1
+        if len(self._pending) >= self.chunk_frames:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        path = os.path.join(self.directory, f"chunk_{self.chunks:05d}.npz")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                counts=np.array([len(b) for b in self._pending], dtype=np.int32),
+                class_ids=np.concatenate([b.class_ids for b in self._pending]),
+                boxes=np.concatenate([b.boxes for b in self._pending]).reshape(-1, 4),
+                confidences=np.concatenate([b.confidences for b in self._pending]),
+            )
+        os.replace(tmp, path)
+        self.chunks += 1
+        self._pending = []
+
+    def close(self, complete=True):
+        self._flush()
+        meta = {
+            "fields": self.fields,
+            "frames": self.frames,
+            "chunks": self.chunks,
+            "frame_height": self.frame_height,
+            "names": list(self.names or ()),
+            "complete": complete,
+        }
+        with open(_meta_path(self.directory), "w") as f:
+            json.dump(meta, f, indent=2)
+
+def replay(directory, columnar=True):
+    """
+    Yield the cached detections frame by frame, as DetectionBatches or
+    (columnar=False) as detect_vehicles() dicts, one chunk in memory at
+    a time
+    """
+    with open(_meta_path(directory)) as f:
+        meta = json.load(f)
+    names = tuple(meta["names"])
+
+    for chunk in range(meta["chunks"]):
+        with np.load(os.path.join(directory, f"chunk_{chunk:05d}.npz")) as data:
+            counts = data["counts"]
+            class_ids = data["class_ids"]
+            boxes = data["boxes"]
+            confidences = data["confidences"]
+
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            batch = DetectionBatch(class_ids[start:end], boxes[start:end],
+                                   confidences[start:end], meta["frame_height"], names)
+            yield batch if columnar else batch.to_dicts()
@@ -0,0 +1,80 @@
+import numpy as np
+
+class DetectionBatch:
+    """
+    Columnar detections for one frame: parallel NumPy arrays instead of
+    one dict per box. frame_height and the class-name table are stored
+    once per frame rather than per detection.
+    """
+
+    __slots__ = ("class_ids", "boxes", "confidences", "frame_height", "names")
+
+    def __init__(self, class_ids, boxes, confidences, frame_height, names):
+        self.class_ids = class_ids        # (N,) int16
+        self.boxes = boxes                # (N, 4) int32 x1, y1, x2, y2
+        self.confidences = confidences    # (N,) float32
+        self.frame_height = frame_height
+        self.names = names                # tuple: class id -> name
+
+    @classmethod
+    def from_result(cls, result, frame_height, names, valid_mask):
+        """
+        One bulk tensor -> array conversion per field, then a single
+        boolean filter against valid_mask (indexed by class id)
+        """
+        boxes = result.boxes
+        class_ids = boxes.cls.cpu().numpy().astype(np.int16)
+        keep = valid_mask[class_ids]
+
+        return cls(
+            class_ids[keep],
+            boxes.xyxy.cpu().numpy()[keep].astype(np.int32),
+            boxes.conf.cpu().numpy()[keep].astype(np.float32),
+            frame_height,
+            names,
+        )
+
+    @classmethod
+    def empty(cls, frame_height, names):
+        return cls(
+            np.empty(0, dtype=np.int16),
+            np.empty((0, 4), dtype=np.int32),
+            np.empty(0, dtype=np.float32),
+            frame_height,
+            names,
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def centers(self):
+        """
+        (N, 2) integer box centers
+        """
+        return np.stack([
+            (self.boxes[:, 0] + self.boxes[:, 2]) // 2,
+            (self.boxes[:, 1] + self.boxes[:, 3]) // 2,
+        ], axis=1)
+
+    def select(self, mask):
+        return DetectionBatch(
+            self.class_ids[mask],
+            self.boxes[mask],
+            self.confidences[mask],
+            self.frame_height,
+            self.names,
+        )
+
+    def to_dicts(self):
+        """
+        The per-detection dict format used by detect_vehicles()
+        """
+        frame_data = []
+        for cls_id, (x1, y1, x2, y2) in zip(self.class_ids.tolist(), self.boxes.tolist()):
+            frame_data.append({
+                "class": self.names[cls_id],
+                "bbox": (x1, y1, x2, y2),
+                "center": ((x1 + x2) // 2, (y1 + y2) // 2),
+                "frame_height": self.frame_height
+            })
+        return frame_data
@@ -1,56 +1,442 @@
-from ultralytics import YOLO
 import cv2
+import numpy as np
+import os
+import queue
+import threading
+import time
+
+from vision.detections import DetectionBatch
+from vision import detection_cache
+from vision.model_registry import get_model, DEFAULT_WEIGHTS
+from vision.zone_mapper import zone_rows
+from monitoring import metrics
 
 # Target resolution: 480p
 TARGET_WIDTH = 854
 TARGET_HEIGHT = 480
 
-# Load YOLOv8 model
-model = YOLO("yolo26x.pt")
+# YOLO weights; loaded lazily through the model registry
+WEIGHTS = DEFAULT_WEIGHTS
+DEVICE = None
+
+# Network input size (longest side)
+IMGSZ = 640
 
 # Relevant classes for Indian traffic
 VALID_CLASSES = ["motorcycle", "car", "bus", "truck", "person"]
 
-def detect_vehicles(video_path):
+CONFIDENCE = 0.4
+
+# Micro-batching: frames per model call and the longest a partial
+# batch may wait (seconds) before it is flushed anyway
+BATCH_SIZE = 1
+MAX_BATCH_WAIT = 0.05
+
+# Longest to wait for the batching reader thread when a stream stops
+READER_JOIN_TIMEOUT = 2.0
+
+_END = object()
+
+# ROI inference: only the rows covering these zones go to the model
+# (None = full frame). Only QUEUE feeds congestion.
+ROI_ZONES = None
+
+# Tallest box expected, as a fraction of frame height (a bus close to
+# the camera)
+MAX_BOX_HEIGHT = 0.3
+
+# Extra rows kept above and below the ROI, as a fraction of frame height:
+# half the tallest box, so a vehicle centered anywhere in the ROI fits in
+# the crop. Taller boxes centered near the ROI edge are cut by the crop,
+# dropped and counted in hemi_roi_clipped_total.
+ROI_PADDING = MAX_BOX_HEIGHT / 2
+
+# Boxes within this many pixels of a crop edge that cuts through the frame
+# are truncated by the crop (their center is shifted) and are dropped
+CROP_EDGE_MARGIN = 2
+
+# Directory for recorded detections (vision.detection_cache); a later run
+# with the same video, weights, CONFIDENCE, IMGSZ and ROI replays them
+# instead of running the model. None = off.
+DETECTION_CACHE = None
+
+FRAMES = metrics.counter("hemi_frames_total", "Frames decoded from the video source")
+DROPPED_FRAMES = metrics.counter(
+    "hemi_frames_dropped_total", "Frames missing from the source stream (timestamp gaps)")
+DECODE = metrics.stage("decode")
+ROI_CLIPPED = metrics.counter(
+    "hemi_roi_clipped_total", "Boxes centered in the ROI dropped because the padded crop cut them")
+RESIZE = metrics.stage("resize")
+PLOT = metrics.stage("plot")
+
+# names dict id -> (names dict, class-name tuple, VALID_CLASSES mask)
+_class_tables = {}
+
+def class_tables(names):
+    """
+    Class names as a tuple indexed by class id, and the matching
+    VALID_CLASSES filter for the columnar path
+    """
+    entry = _class_tables.get(id(names))
+    if entry is None or entry[0] is not names:
+        class_names = tuple(names[i] for i in range(len(names)))
+        valid_mask = np.array([n in VALID_CLASSES for n in class_names], dtype=bool)
+        entry = (names, class_names, valid_mask)
+        _class_tables[id(names)] = entry
+    return entry[1], entry[2]
+
+def configure_model(weights, device=DEVICE, imgsz=IMGSZ):
+    """
+    Switch the model and input size used by infer(), e.g. to an exported
+    ONNX/OpenVINO artifact (see vision.backends) or a smaller variant
+    (see vision.autoscaler). Loaded through the registry.
+    """
+    global WEIGHTS, DEVICE, IMGSZ
+    WEIGHTS = weights
+    DEVICE = device
+    IMGSZ = imgsz
+
+@metrics.timed("inference")
+def infer(frames):
+    """
+    Run the configured model on one frame or a list of frames
+    """
+    return get_model(WEIGHTS, DEVICE)(frames, conf=CONFIDENCE, imgsz=IMGSZ, verbose=False)
+
+def roi_rows(frame_height, zones=ROI_ZONES, padding=ROI_PADDING, zone_map=None):
+    """
+    Returns (band, crop): the ROI rows [top, bottom) and the padded rows
+    actually cropped for inference. With a ZoneMap, zones are its
+    polygon names ("QUEUE" stands for its queue_zones) and the band is
+    their bounding rows.
+    """
+    if zone_map is not None:
+        names = []
+        for zone in zones:
+            if zone == "QUEUE" and zone not in zone_map.names:
+                names.extend(zone_map.queue_zones)
+            else:
+                names.append(zone)
+        unknown = [z for z in names if z not in zone_map.names]
+        if unknown or not names:
+            raise ValueError(f"ROI_ZONES {tuple(zones)} do not match the camera's zone map "
+                             f"(zones {zone_map.names[:-1]}, queue_zones {zone_map.queue_zones})")
+        top, bottom = zone_map.rows(names)
+    else:
+        top, bottom = zone_rows(zones, frame_height)
+    pad = int(frame_height * padding)
+    return (top, bottom), (max(0, top - pad), min(frame_height, bottom + pad))
+
+def infer_roi(frames, zones=ROI_ZONES, padding=ROI_PADDING, zone_map=None):
+    """
+    Run the model on the padded ROI crop of each frame only.
+    Returns (results, crop, band) for mapping boxes back.
+    """
+    band, crop = roi_rows(frames[0].shape[0], zones, padding, zone_map)
+    crops = [frame[crop[0]:crop[1]] for frame in frames]
+    return infer(crops), crop, band
+
+def _crop_cuts(crop, frame_height):
+    """
+    (top, bottom) full-frame rows below/above which a box touches a crop
+    edge inside the frame; edges that are the frame's own never cut
+    """
+    top = crop[0] + CROP_EDGE_MARGIN if crop[0] > 0 else -1
+    bottom = crop[1] - CROP_EDGE_MARGIN if crop[1] < frame_height else frame_height + 1
+    return top, bottom
+
+@metrics.timed("postprocess")
+def extract_detections(result, frame_height, crop=None, band=None):
+    """
+    Convert one YOLO result into the per-frame list of detection dicts.
+    crop (top, bottom rows of an ROI crop) maps boxes back to full-frame
+    rows and drops boxes cut off by the crop; with a band, only
+    detections centered inside [top, bottom) are kept.
+    """
+    frame_data = []
+    y_offset = crop[0] if crop is not None else 0
+    if crop is not None:
+        cut_top, cut_bottom = _crop_cuts(crop, frame_height)
+
+    for box in result.boxes:
+        cls_id = int(box.cls[0])
+        cls_name = result.names[cls_id]
+
+        if cls_name in VALID_CLASSES:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            y1 += y_offset
+            y2 += y_offset
+            cx = (x1 + x2) // 2
+            cy = (y1 + y2) // 2
+
+            if band is not None and not band[0] <= cy < band[1]:
+                continue
+            if crop is not None and (y1 <= cut_top or y2 >= cut_bottom):
+                ROI_CLIPPED.inc()
+                continue
+
+            frame_data.append({
+                "class": cls_name,
+                "bbox": (x1, y1, x2, y2),
+                "center": (cx, cy),
+                "frame_height": frame_height
+            })
+
+    return frame_data
+
+@metrics.timed("postprocess")
+def extract_batch(result, frame_height, crop=None, band=None):
+    """
+    Convert one YOLO result into a columnar DetectionBatch
+    (crop/band as in extract_detections)
+    """
+    class_names, valid_mask = class_tables(result.names)
+    batch = DetectionBatch.from_result(result, frame_height, class_names, valid_mask)
+
+    if crop is not None:
+        batch.boxes[:, 1] += crop[0]
+        batch.boxes[:, 3] += crop[0]
+        cut_top, cut_bottom = _crop_cuts(crop, frame_height)
+        whole = (batch.boxes[:, 1] > cut_top) & (batch.boxes[:, 3] < cut_bottom)
+        if band is not None and not whole.all():
+            cy = batch.centers()[:, 1]
+            ROI_CLIPPED.inc(int(np.count_nonzero(~whole & (cy >= band[0]) & (cy < band[1]))))
+        batch = batch.select(whole)
+    if band is not None:
+        cy = batch.centers()[:, 1]
+        batch = batch.select((cy >= band[0]) & (cy < band[1]))
+    return batch
+
+def video_fps(video_path, default=25.0):
     cap = cv2.VideoCapture(video_path)
-    detections_per_frame = []
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+def _count_dropped(cap, fps, last_ms):
+    """
+    Frames the source skipped since the previous one, from its timestamps
+    """
+    pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if last_ms is not None and fps > 0:
+        gap = (pos_ms - last_ms) * fps / 1000.0
+        if gap > 1.5:
+            DROPPED_FRAMES.inc(int(round(gap)) - 1)
+    return pos_ms
+
+def read_frames(cap):
+    """
+    Yield decoded frames resized to 480p
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    last_ms = None
+    start = 0.0
 
     while cap.isOpened():
+        if metrics.ENABLED:
+            start = time.perf_counter()
         ret, frame = cap.read()
         if not ret:
             break
 
+        if metrics.ENABLED:
+            DECODE.observe_since(start)
+            FRAMES.inc()
+            last_ms = _count_dropped(cap, fps, last_ms)
+            start = time.perf_counter()
+
         # Resize frame to 480p
         frame = cv2.resize(frame, (TARGET_WIDTH, TARGET_HEIGHT))
+        if metrics.ENABLED:
+            RESIZE.observe_since(start)
+        yield frame
 
-        results = model(frame, conf=0.4, verbose=False)
-        frame_data = []
+def _put_unless_stopped(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
 
-        for box in results[0].boxes:
-            cls_id = int(box.cls[0])
-            cls_name = model.names[cls_id]
+def _read_ahead(frames, q, stop, release=None):
+    # Reader thread for batch_frames(): frames (or the error) -> q, then
+    # _END; the source is released here, after the last read returned
+    try:
+        for frame in frames:
+            if not _put_unless_stopped(q, frame, stop):
+                return
+    except Exception as e:
+        _put_unless_stopped(q, e, stop)
+    finally:
+        if release is not None:
+            release()
+    _put_unless_stopped(q, _END, stop)
 
-            if cls_name in VALID_CLASSES:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cx = (x1 + x2) // 2
-                cy = (y1 + y2) // 2
+def batch_frames(frames, batch_size=BATCH_SIZE, max_wait=MAX_BATCH_WAIT, release=None):
+    """
+    Group frames into lists of up to batch_size, flushing a partial batch
+    once its oldest frame has waited max_wait seconds. Frames are read on
+    a separate thread, so the deadline holds even when the source stalls.
 
-                frame_data.append({
-                    "class": cls_name,
-                    "bbox": (x1, y1, x2, y2),
-                    "center": (cx, cy),
-                    "frame_height": frame.shape[0]
-                })
+    release (e.g. the capture's release) is called once nothing reads
+    frames any more: by the reader thread itself, so never while it is
+    still inside a read, even when the generator is closed early.
+    """
+    if batch_size <= 1:
+        try:
+            for frame in frames:
+                yield [frame]
+        finally:
+            if release is not None:
+                release()
+        return
 
-        detections_per_frame.append(frame_data)
+    q = queue.Queue(maxsize=2 * batch_size)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_ahead, args=(frames, q, stop, release),
+                              name="frame-reader", daemon=True)
+    reader.start()
 
-        # Visualization
-        annotated = results[0].plot()
-        cv2.imshow("Traffic Detection (480p)", annotated)
+    try:
+        done = False
+        while not done:
+            item = q.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
 
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+            batch = [item]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _END:
+                    done = True
+                    break
+                if isinstance(item, Exception):
+                    yield batch
+                    raise item
+                batch.append(item)
 
-    cap.release()
-    cv2.destroyAllWindows()
-    return detections_per_frame
+            yield batch
+    finally:
+        stop.set()
+        # A reader stuck in read() past the timeout still releases the
+        # source when the read returns
+        reader.join(timeout=READER_JOIN_TIMEOUT)
+
+def cache_entry(video_path, cache_dir=DETECTION_CACHE, roi_zones=ROI_ZONES, zone_map=None):
+    """
+    (directory, key fields) of the detection cache entry for a run of
+    the configured model over video_path
+    """
+    roi = None
+    if roi_zones:
+        band, crop = roi_rows(TARGET_HEIGHT, roi_zones, ROI_PADDING, zone_map)
+        roi = [list(band), list(crop)]
+    key, fields = detection_cache.cache_key(
+        video_path, WEIGHTS, CONFIDENCE, IMGSZ, (TARGET_WIDTH, TARGET_HEIGHT), VALID_CLASSES, roi
+    )
+    return os.path.join(cache_dir, key), fields
+
+def stream_detections(video_path, headless=False,
+                      batch_size=BATCH_SIZE, max_wait=MAX_BATCH_WAIT,
+                      columnar=False, roi_zones=ROI_ZONES, zone_map=None,
+                      autoscaler=None, cache_dir=DETECTION_CACHE):
+    """
+    Yield each frame's detections as soon as they are ready.
+    Nothing is kept between frames, so memory stays bounded on live
+    cameras and long recordings. headless=True skips plotting and
+    the preview window.
+
+    With batch_size > 1, up to batch_size frames (or whatever arrived
+    within max_wait seconds) go through the model in one call; the
+    detections are still yielded one frame at a time, in order.
+
+    columnar=True yields a DetectionBatch per frame instead of a list
+    of dicts. roi_zones restricts inference (and the output) to those
+    zones' rows, with boxes in full-frame coordinates (polygon zone
+    names when a zone_map is given).
+
+    An autoscaler (vision.autoscaler.LatencyAutoscaler) is told the
+    latency of every model call and may switch the model in between.
+
+    With a cache_dir, the detections of a video file are recorded there,
+    or replayed from a complete earlier recording with the same key (no
+    decoding, inference or preview). Not used for live sources, which
+    cannot be hashed, nor together with an autoscaler, whose model
+    switches would make the recording depend on load.
+    """
+    extract = extract_batch if columnar else extract_detections
+
+    cache = None
+    if cache_dir is not None and autoscaler is None and not os.path.isfile(str(video_path)):
+        print(f"[CACHE] {video_path} is not a video file, not caching")
+    elif cache_dir is not None and autoscaler is None:
+        directory, fields = cache_entry(video_path, cache_dir, roi_zones, zone_map)
+        if detection_cache.is_complete(directory):
+            print(f"[CACHE] Replaying detections from {directory}")
+            yield from detection_cache.replay(directory, columnar)
+            return
+        print(f"[CACHE] Recording detections to {directory}")
+        cache = detection_cache.DetectionCacheWriter(directory, fields)
+        extract = extract_batch
+
+    cap = cv2.VideoCapture(video_path)
+    # The capture is released by batch_frames, after its last read
+    batches = batch_frames(read_frames(cap), batch_size, max_wait, release=cap.release)
+    finished = False
+
+    try:
+        for frames in batches:
+            start = time.perf_counter()
+            if roi_zones:
+                results, crop, band = infer_roi(frames, roi_zones, ROI_PADDING, zone_map)
+            else:
+                results, crop, band = infer(frames), None, None
+            if autoscaler is not None:
+                autoscaler.observe(time.perf_counter() - start, len(frames))
+
+            for frame, result in zip(frames, results):
+                detections = extract(result, frame.shape[0], crop, band)
+                if cache is not None:
+                    cache.add(detections)
+                    if not columnar:
+                        detections = detections.to_dicts()
+                yield detections
+
+                if headless:
+                    continue
+
+                # Visualization
+                start = time.perf_counter()
+                annotated = result.plot()
+                cv2.imshow("Traffic Detection (480p)", annotated)
+                key = cv2.waitKey(1) & 0xFF
+                if metrics.ENABLED:
+                    PLOT.observe_since(start)
+
+                if key == ord("q"):
+                    return
+        finished = True
+    finally:
+        batches.close()
+        if cache is not None:
+            cache.close(complete=finished)
+        if not headless:
+            cv2.destroyAllWindows()
+
+def detect_vehicles(video_path, headless=False,
+                    batch_size=BATCH_SIZE, max_wait=MAX_BATCH_WAIT,
+                    columnar=False, roi_zones=ROI_ZONES, zone_map=None,
+                    autoscaler=None, cache_dir=DETECTION_CACHE):
+    return list(stream_detections(video_path, headless, batch_size, max_wait,
+                                  columnar, roi_zones, zone_map, autoscaler, cache_dir))
@@ -0,0 +1,194 @@
+import time
+
+import cv2
+import numpy as np
+
+from vision.detector import infer, read_frames, extract_detections
+from pipeline.stages import queue_congestion
+from monitoring import metrics
+
+# Run the full detector every KEYFRAME_INTERVAL frames; in between,
+# boxes are carried forward with sparse optical flow
+KEYFRAME_INTERVAL = 5
+
+# Adaptive mode: force an early keyframe once this share of the
+# carried boxes has been lost by the tracker
+MAX_LOST_RATIO = 0.3
+
+# Optical flow sample grid inside each box (GRID x GRID points)
+GRID = 3
+MIN_TRACKED_POINTS = 3
+
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+)
+
+_GRID_STEPS = (np.arange(GRID) + 1) / (GRID + 1)
+
+def _sample_points(boxes):
+    """
+    GRID x GRID points spread over each box -> (N * GRID * GRID, 1, 2)
+    """
+    x1, y1, x2, y2 = (boxes[:, i:i + 1] for i in range(4))
+    xs = x1 + (x2 - x1) * _GRID_STEPS
+    ys = y1 + (y2 - y1) * _GRID_STEPS
+    px = np.repeat(xs, GRID, axis=1)
+    py = np.tile(ys, (1, GRID))
+    return np.stack([px, py], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+
+class FlowTracker:
+    """
+    Carries keyframe detections forward frame to frame. Each box moves by
+    the median flow of its sample points; boxes with too few tracked
+    points are dropped.
+    """
+
+    def __init__(self):
+        self.prev_gray = None
+        self.detections = []
+        self.lost = 0
+        self.carried = 0
+
+    def reset(self, gray, detections):
+        self.prev_gray = gray
+        self.detections = detections
+        self.lost = 0
+        self.carried = len(detections)
+
+    def lost_ratio(self):
+        if self.carried == 0:
+            return 0.0
+        return self.lost / self.carried
+
+    @metrics.timed("optical_flow")
+    def update(self, gray):
+        if not self.detections:
+            self.prev_gray = gray
+            return []
+
+        boxes = np.array([d["bbox"] for d in self.detections], dtype=np.float32)
+        points = _sample_points(boxes)
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, gray, points, None, **LK_PARAMS
+        )
+        self.prev_gray = gray
+
+        n = len(boxes)
+        ok = status.reshape(n, -1).astype(bool)
+        flow = (moved - points).reshape(n, -1, 2)
+        flow[~ok] = np.nan
+
+        keep = ok.sum(axis=1) >= MIN_TRACKED_POINTS
+        shift = np.zeros((n, 2), dtype=np.float32)
+        if keep.any():
+            shift[keep] = np.nanmedian(flow[keep], axis=1)
+
+        height, width = gray.shape
+        tracked = []
+
+        for d, k, (dx, dy) in zip(self.detections, keep, shift):
+            if not k:
+                continue
+
+            x1, y1, x2, y2 = d["bbox"]
+            x1 = int(np.clip(x1 + dx, 0, width - 1))
+            x2 = int(np.clip(x2 + dx, 0, width - 1))
+            y1 = int(np.clip(y1 + dy, 0, height - 1))
+            y2 = int(np.clip(y2 + dy, 0, height - 1))
+
+            tracked.append({
+                "class": d["class"],
+                "bbox": (x1, y1, x2, y2),
+                "center": ((x1 + x2) // 2, (y1 + y2) // 2),
+                "frame_height": d["frame_height"]
+            })
+
+        self.lost += n - len(tracked)
+        self.detections = tracked
+        return tracked
+
+def _keyframe_frames(frames, keyframe_interval, adaptive):
+    """
+    Yield (detections, is_keyframe) for every frame
+    """
+    tracker = FlowTracker()
+    since_keyframe = keyframe_interval
+
+    for frame in frames:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        due = since_keyframe >= keyframe_interval
+        if adaptive and tracker.lost_ratio() > MAX_LOST_RATIO:
+            due = True
+
+        if due:
+            results = infer(frame)
+            detections = extract_detections(results[0], frame.shape[0])
+            tracker.reset(gray, detections)
+            since_keyframe = 1
+            yield detections, True
+        else:
+            since_keyframe += 1
+            yield tracker.update(gray), False
+
+def stream_keyframe_detections(video_path, keyframe_interval=KEYFRAME_INTERVAL,
+                               adaptive=True):
+    """
+    Drop-in, headless replacement for stream_detections(): the full
+    detector runs on keyframes only and boxes are tracked in between.
+    Output is the same list of detection dicts per frame.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        for detections, _ in _keyframe_frames(read_frames(cap), keyframe_interval, adaptive):
+            yield detections
+    finally:
+        cap.release()
+
+def evaluate_keyframes(video_path, keyframe_interval=KEYFRAME_INTERVAL,
+                       adaptive=True, max_frames=500):
+    """
+    Measure the congestion error and speed-up of keyframe mode against
+    running the detector on every frame, over the first max_frames frames.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        for frame in read_frames(cap):
+            frames.append(frame)
+            if len(frames) >= max_frames:
+                break
+    finally:
+        cap.release()
+
+    if not frames:
+        return None
+
+    start = time.perf_counter()
+    reference = []
+    for frame in frames:
+        results = infer(frame)
+        reference.append(queue_congestion(extract_detections(results[0], frame.shape[0])))
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approx = []
+    keyframes = 0
+    for detections, is_keyframe in _keyframe_frames(frames, keyframe_interval, adaptive):
+        approx.append(queue_congestion(detections))
+        keyframes += is_keyframe
+    keyframe_time = time.perf_counter() - start
+
+    error = np.abs(np.array(reference, dtype=float) - np.array(approx, dtype=float))
+
+    return {
+        "frames": len(frames),
+        "keyframes": keyframes,
+        "speedup": round(full_time / keyframe_time, 2) if keyframe_time > 0 else None,
+        "mean_abs_error": round(float(error.mean()), 3),
+        "p95_abs_error": round(float(np.percentile(error, 95)), 3),
+        "max_abs_error": round(float(error.max()), 3),
+    }
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_WEIGHTS = "yolo26x.pt"
+
+# One instance per (weights, device) per process, created on first use
+_models = {}
+_load_times = {}
+_lock = threading.Lock()
+
+def get_model(weights=DEFAULT_WEIGHTS, device=None):
+    """
+    Return the cached model for (weights, device), loading it on first use.
+    ultralytics is only imported here, so importing the vision modules
+    stays cheap for tools that never run inference.
+    """
+    key = (weights, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            from ultralytics import YOLO
+
+            start = time.perf_counter()
+            model = YOLO(weights)
+            if device is not None:
+                model.to(device)
+            _load_times[key] = time.perf_counter() - start
+            _models[key] = model
+
+    return model
+
+def is_loaded(weights=DEFAULT_WEIGHTS, device=None):
+    return (weights, device) in _models
+
+def load_time(weights=DEFAULT_WEIGHTS, device=None):
+    return _load_times.get((weights, device))
+
+def warm_up(model, runs=2, height=480, width=854, batch_size=1, imgsz=None):
+    """
+    Run dummy inferences so the first real frame doesn't pay for graph
+    initialization and memory allocation. Returns per-run latencies (s).
+    imgsz warms up that network input size instead of the model default.
+    """
+    frames = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(batch_size)]
+    options = {} if imgsz is None else {"imgsz": imgsz}
+    latencies = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(frames, verbose=False, **options)
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+def startup_report(weights=DEFAULT_WEIGHTS, device=None, runs=2,
+                   height=480, width=854, batch_size=1):
+    """
+    Load and warm up a model, printing cold start and first-frame latency
+    """
+    model = get_model(weights, device)
+    cold_start = load_time(weights, device)
+
+    latencies = warm_up(model, runs, height, width, batch_size) if runs else []
+
+    print("\n=== MODEL STARTUP ===")
+    print(f"Weights       : {weights} ({device or 'default device'})")
+    print(f"Cold start    : {cold_start * 1000:.0f} ms")
+    if latencies:
+        print(f"First frame   : {latencies[0] * 1000:.0f} ms")
+        print(f"Warm frame    : {latencies[-1] * 1000:.0f} ms")
+
+    return {
+        "cold_start": cold_start,
+        "first_frame": latencies[0] if latencies else None,
+        "warm_frame": latencies[-1] if latencies else None,
+    }
@@ -0,0 +1,256 @@
+import collections
+
+import numpy as np
+
+from vision.zone_mapper import classify_zones, ZONES
+from monitoring import metrics
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# ByteTrack-style two-stage association
+HIGH_CONFIDENCE = 0.5
+MATCH_IOU = 0.3          # first stage, high-confidence detections
+LOW_MATCH_IOU = 0.5      # second stage, low-confidence detections
+
+MAX_MISSES = 15          # frames a track survives without a detection
+MIN_HITS = 3             # detections before a track counts as a vehicle
+VELOCITY_SMOOTHING = 0.3
+
+# Arrival rate window (seconds)
+ARRIVAL_WINDOW = 60
+
+def iou_matrix(a, b):
+    """
+    Pairwise IoU between (N, 4) and (M, 4) xyxy boxes -> (N, M)
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+def match(iou, threshold):
+    """
+    Linear assignment on 1 - IoU (greedy by IoU when SciPy is missing).
+    Returns (matched row idx, matched col idx, unmatched rows, unmatched cols).
+    """
+    rows, cols = iou.shape
+    if rows == 0 or cols == 0:
+        return np.empty(0, int), np.empty(0, int), np.arange(rows), np.arange(cols)
+
+    if linear_sum_assignment is not None:
+        r, c = linear_sum_assignment(1.0 - iou)
+    else:
+        order = np.argsort(-iou, axis=None)
+        used_r, used_c, r, c = set(), set(), [], []
+        for flat in order:
+            i, j = divmod(int(flat), cols)
+            if iou[i, j] < threshold:
+                break
+            if i in used_r or j in used_c:
+                continue
+            used_r.add(i)
+            used_c.add(j)
+            r.append(i)
+            c.append(j)
+        r, c = np.array(r, int), np.array(c, int)
+
+    keep = iou[r, c] >= threshold
+    r, c = r[keep], c[keep]
+    return (
+        r, c,
+        np.setdiff1d(np.arange(rows), r),
+        np.setdiff1d(np.arange(cols), c),
+    )
+
+def _centers(boxes):
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+class VehicleTracker:
+    """
+    SORT/ByteTrack-style tracker over DetectionBatch frames. Track state is
+    kept as parallel arrays, so prediction, IoU and updates are vectorized.
+
+    update() returns zone transition events; active() gives the confirmed
+    tracks with their ids, boxes, zones and velocity in pixels per second.
+    """
+
+    def __init__(self, zone_map=None):
+        # Polygon ZoneMap for this camera; default is the ENTRY/QUEUE/EXIT bands
+        self.zone_map = zone_map
+        self.zone_names = zone_map.names if zone_map is not None else ZONES
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocity = np.empty((0, 2), dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int16)
+        self.hits = np.empty(0, dtype=np.int32)
+        self.misses = np.empty(0, dtype=np.int32)
+        self.zones = np.empty(0, dtype=np.int64)
+        # Center and time of each track's last matched detection
+        self.seen_centers = np.empty((0, 2), dtype=np.float32)
+        self.seen_time = np.empty(0, dtype=np.float64)
+
+        self.next_id = 1
+        self.last_time = None
+        self.names = ()
+
+        self.vehicle_count = 0
+        self.class_counts = collections.Counter()
+        self.arrivals = collections.deque()
+
+    def _predict(self, dt):
+        if dt > 0 and len(self.ids):
+            shift = self.velocity * dt
+            self.boxes += np.concatenate([shift, shift], axis=1)
+
+    @metrics.timed("tracking")
+    def update(self, batch, t):
+        dt = 0.0 if self.last_time is None else t - self.last_time
+        self.last_time = t
+        self.names = batch.names
+        self._predict(dt)
+
+        det_boxes = batch.boxes.astype(np.float32)
+        high = batch.confidences >= HIGH_CONFIDENCE
+        high_idx = np.flatnonzero(high)
+        low_idx = np.flatnonzero(~high)
+
+        # Stage 1: all tracks vs high-confidence detections
+        r1, c1, free_tracks, free_high = match(
+            iou_matrix(self.boxes, det_boxes[high_idx]), MATCH_IOU
+        )
+        # Stage 2: leftover tracks vs low-confidence detections
+        r2, c2, _, _ = match(
+            iou_matrix(self.boxes[free_tracks], det_boxes[low_idx]), LOW_MATCH_IOU
+        )
+
+        track_idx = np.concatenate([r1, free_tracks[r2]]).astype(int)
+        det_idx = np.concatenate([high_idx[c1], low_idx[c2]]).astype(int)
+        self._apply_matches(track_idx, det_boxes[det_idx], t)
+
+        unmatched = np.setdiff1d(np.arange(len(self.ids)), track_idx)
+        self.misses[unmatched] += 1
+        self._keep(self.misses <= MAX_MISSES)
+
+        self._spawn(batch, det_boxes, high_idx[free_high], t)
+
+        return self._zone_events(batch.frame_height, t)
+
+    def _apply_matches(self, track_idx, new_boxes, t):
+        if len(track_idx) == 0:
+            return
+
+        centers = _centers(new_boxes)
+        elapsed = t - self.seen_time[track_idx]
+        moving = elapsed > 0
+        if moving.any():
+            i = track_idx[moving]
+            measured = (centers[moving] - self.seen_centers[i]) / elapsed[moving, None]
+            self.velocity[i] += VELOCITY_SMOOTHING * (measured - self.velocity[i])
+
+        self.boxes[track_idx] = new_boxes
+        self.seen_centers[track_idx] = centers
+        self.seen_time[track_idx] = t
+        self.hits[track_idx] += 1
+        self.misses[track_idx] = 0
+
+    def _keep(self, mask):
+        self.ids = self.ids[mask]
+        self.boxes = self.boxes[mask]
+        self.velocity = self.velocity[mask]
+        self.class_ids = self.class_ids[mask]
+        self.hits = self.hits[mask]
+        self.misses = self.misses[mask]
+        self.zones = self.zones[mask]
+        self.seen_centers = self.seen_centers[mask]
+        self.seen_time = self.seen_time[mask]
+
+    def _spawn(self, batch, det_boxes, det_idx, t):
+        n = len(det_idx)
+        if n == 0:
+            return
+
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.next_id += n
+        self.boxes = np.concatenate([self.boxes, det_boxes[det_idx]])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n, 2), np.float32)])
+        self.class_ids = np.concatenate([self.class_ids, batch.class_ids[det_idx]])
+        self.hits = np.concatenate([self.hits, np.ones(n, np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, np.int32)])
+        self.zones = np.concatenate([self.zones, np.full(n, -1, np.int64)])
+        self.seen_centers = np.concatenate([self.seen_centers, _centers(det_boxes[det_idx])])
+        self.seen_time = np.concatenate([self.seen_time, np.full(n, t, np.float64)])
+
+    def _zone_events(self, frame_height, t):
+        events = []
+        confirmed = self.hits >= MIN_HITS
+        if not confirmed.any():
+            return events
+
+        idx = np.flatnonzero(confirmed)
+        centers = _centers(self.boxes[idx])
+        if self.zone_map is not None:
+            zones = self.zone_map.classify(centers)
+        else:
+            zones = classify_zones(centers[:, 1], frame_height)
+        previous = self.zones[idx]
+        changed = np.flatnonzero(zones != previous)
+
+        for k in changed:
+            i = idx[k]
+            old, new = int(previous[k]), int(zones[k])
+            if old == -1:
+                # First time confirmed: a new unique vehicle
+                self.vehicle_count += 1
+                self.class_counts[self.names[self.class_ids[i]]] += 1
+            else:
+                events.append({"track_id": int(self.ids[i]), "event": "exit",
+                               "zone": self.zone_names[old], "time": t})
+            events.append({"track_id": int(self.ids[i]), "event": "enter",
+                           "zone": self.zone_names[new], "time": t})
+            if self._is_queue(new):
+                self.arrivals.append(t)
+
+        self.zones[idx] = zones
+        return events
+
+    def _is_queue(self, label):
+        if self.zone_map is not None:
+            return label in self.zone_map.queue_labels
+        return self.zone_names[label] == "QUEUE"
+
+    def arrival_rate(self, now=None, window=ARRIVAL_WINDOW):
+        """
+        Vehicles entering the QUEUE zone per minute over the last `window` s
+        """
+        now = self.last_time if now is None else now
+        if now is None:
+            return 0.0
+        while self.arrivals and self.arrivals[0] < now - window:
+            self.arrivals.popleft()
+        return len(self.arrivals) * 60.0 / window
+
+    def active(self):
+        confirmed = self.hits >= MIN_HITS
+        return {
+            "ids": self.ids[confirmed],
+            "boxes": self.boxes[confirmed].astype(np.int32),
+            "velocity": self.velocity[confirmed],
+            "speed": np.linalg.norm(self.velocity[confirmed], axis=1),
+            "class_ids": self.class_ids[confirmed],
+            "zones": self.zones[confirmed],
+        }
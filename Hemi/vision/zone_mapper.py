@@ -1,10 +1,150 @@
+import json
+
+import cv2
+import numpy as np
+
+from monitoring import metrics
+
+# Vertical zone bands as fractions of frame height
+ZONE_BOUNDS = {
+    "ENTRY": (0.0, 0.4),
+    "QUEUE": (0.4, 0.75),
+    "EXIT": (0.75, 1.0),
+}
+
 def classify_zone(y, frame_height):
     """
     Indian traffic: use vertical zones instead of lanes
     """
-    if y < frame_height * 0.4:
+    if y < frame_height * ZONE_BOUNDS["QUEUE"][0]:
         return "ENTRY"
-    elif y < frame_height * 0.75:
+    elif y < frame_height * ZONE_BOUNDS["EXIT"][0]:
         return "QUEUE"
     else:
         return "EXIT"
+
+# Zone names indexed by the codes returned from classify_zones()
+ZONES = ("ENTRY", "QUEUE", "EXIT")
+ENTRY, QUEUE, EXIT = range(3)
+
+@metrics.timed("zones")
+def classify_zones(ys, frame_height):
+    """
+    Vectorized classify_zone(): array of y values -> array of zone codes
+    """
+    return np.digitize(ys, (frame_height * ZONE_BOUNDS["QUEUE"][0],
+                            frame_height * ZONE_BOUNDS["EXIT"][0]))
+
+def zone_rows(zones, frame_height):
+    """
+    Pixel rows [top, bottom) covering all of the given zones
+    """
+    top = min(ZONE_BOUNDS[z][0] for z in zones)
+    bottom = max(ZONE_BOUNDS[z][1] for z in zones)
+    return int(frame_height * top), int(np.ceil(frame_height * bottom))
+
+
+# Per-camera polygon zones, see load_zone_map()
+ZONES_PATH = "zones.json"
+
+# Working resolution: every frame is resized to vision.detector's
+# TARGET_WIDTH x TARGET_HEIGHT before detection, so masks are built here
+TARGET_WIDTH = 854
+TARGET_HEIGHT = 480
+
+class ZoneMap:
+    """
+    Arbitrary polygon zones for one camera, rasterized once into a label
+    image at the working resolution. Classifying every detection center
+    of a frame is then one array index, however many zones there are.
+
+    Polygons are in pixels of a width x height frame (scaled to the
+    working resolution) or normalized to 0-1. Later polygons are painted
+    over earlier ones where they overlap; pixels outside every polygon
+    get the "OUTSIDE" label.
+    """
+
+    def __init__(self, polygons, width=TARGET_WIDTH, height=TARGET_HEIGHT, queue_zones=None):
+        if len(polygons) >= 255:
+            raise ValueError("at most 254 zones per camera")
+
+        self.width = TARGET_WIDTH
+        self.height = TARGET_HEIGHT
+        self.names = tuple(polygons) + ("OUTSIDE",)
+        self.mask = np.full((self.height, self.width), len(polygons), dtype=np.uint8)
+
+        for label, points in enumerate(polygons.values()):
+            pts = np.asarray(points, dtype=np.float64)
+            if pts.max() <= 1.0:
+                # Normalized coordinates
+                pts = pts * (self.width, self.height)
+            else:
+                pts = pts * (self.width / width, self.height / height)
+            cv2.fillPoly(self.mask, [np.round(pts).astype(np.int32)], label)
+
+        if queue_zones is None:
+            queue_zones = [name for name in polygons if name == "QUEUE"]
+        self.queue_zones = tuple(queue_zones)
+        self.queue_labels = np.array([self.names.index(z) for z in queue_zones], dtype=np.int64)
+
+    @classmethod
+    def from_bands(cls):
+        """
+        The default ENTRY/QUEUE/EXIT height bands as polygons
+        """
+        polygons = {
+            name: [[0, top], [1, top], [1, bottom], [0, bottom]]
+            for name, (top, bottom) in ZONE_BOUNDS.items()
+        }
+        return cls(polygons)
+
+    @metrics.timed("zones")
+    def classify(self, centers):
+        """
+        (N, 2) x, y centers -> (N,) zone labels (indexes into names)
+        """
+        centers = np.asarray(centers)
+        if len(centers) == 0:
+            return np.empty(0, dtype=np.int64)
+        xs = np.clip(centers[:, 0].astype(np.int64), 0, self.width - 1)
+        ys = np.clip(centers[:, 1].astype(np.int64), 0, self.height - 1)
+        return self.mask[ys, xs].astype(np.int64)
+
+    def in_queue(self, labels):
+        return np.isin(labels, self.queue_labels)
+
+    def rows(self, zones):
+        """
+        Pixel rows [top, bottom) covering the given zones
+        """
+        labels = [self.names.index(z) for z in zones]
+        hit = np.flatnonzero(np.isin(self.mask, labels).any(axis=1))
+        if len(hit) == 0:
+            return 0, self.height
+        return int(hit[0]), int(hit[-1]) + 1
+
+def load_zone_map(camera_id, path=ZONES_PATH):
+    """
+    zones.json: {"<camera id>": {"width": 1280, "height": 720,
+                                 "zones": {"<name>": [[x, y], ...], ...},
+                                 "queue_zones": ["<name>", ...]}}
+    Coordinates are pixels at width x height (the resolution they were
+    drawn at, default the working one), or normalized to 0-1.
+    Returns None when the camera has no polygon zones configured.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    camera = config.get(camera_id)
+    if camera is None:
+        return None
+
+    return ZoneMap(
+        camera["zones"],
+        camera.get("width", TARGET_WIDTH),
+        camera.get("height", TARGET_HEIGHT),
+        camera.get("queue_zones"),
+    )